@@ -0,0 +1,208 @@
+"""Banc d'essai des temps de frame : rejoue une partie scriptée (graine fixe, pilote SDL factice)
+et mesure update / draw / présentation pour chaque état (menu, dialogue, playing, game_over, victory).
+
+    python bench.py --out resultats.json
+    python bench.py --compare resultats.json   # code de sortie 1 si un p95 régresse
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+import platform
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+import pygame
+
+import plateformer as pf
+from profiler import profiler
+
+BENCH_VERSION = 1
+PERCENTILES = (50, 90, 95, 99)
+SCENES = ("menu", "dialogue", "playing", "game_over", "victory")
+
+def key_event(key):
+    return pygame.event.Event(pygame.KEYDOWN, key=key, mod=0, unicode="", scancode=0)
+
+def click_event(pos):
+    return pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1, pos=pos)
+
+# --- SEQUENCES SCRIPTEES ---
+# Chaque frame est un triplet (évènements, bits INPUT_* maintenus, position souris).
+# Atteindre la sortie et mourir passent par un déplacement direct du joueur : le parcours
+# exact d'un niveau aléatoire n'a pas d'intérêt ici, seul le coût des frames est mesuré.
+
+def skip_dialogue(app, limit=2000):
+    """Espace toutes les 4 frames jusqu'à la fin du dialogue"""
+    for f in range(limit):
+        if app.state != app.STATE_DIALOGUE:
+            return
+        yield ([key_event(pygame.K_SPACE)] if f % 4 == 0 else []), 0, (0, 0)
+    raise RuntimeError("dialogue jamais terminé")
+
+def run_and_jump(app, frames):
+    """Course vers la droite avec un saut toutes les 30 frames (s'arrête si la partie est finie)"""
+    for f in range(frames):
+        if app.game.finished:
+            return
+        yield ([key_event(pygame.K_SPACE)] if f % 30 == 0 else []), pf.INPUT_RIGHT, (0, 0)
+
+def idle(frames):
+    for _ in range(frames):
+        yield [], 0, (0, 0)
+
+def script(app, play_frames=240):
+    """Partie complète : menu, dialogue, course, morts jusqu'au game over, puis (après R)
+    sorties de niveau jusqu'à la victoire"""
+    # Menu : immobile, puis survol du bouton, puis clic
+    yield from idle(60)
+    button = app.main_menu.play_rect.center
+    for f in range(60):
+        yield [], 0, (button if f // 15 % 2 == 0 else (0, 0))
+    yield [click_event(button)], 0, button
+
+    yield from skip_dialogue(app)
+    yield from run_and_jump(app, play_frames)
+
+    # Toucher un ennemi jusqu'au game over
+    for _ in range(pf.MAX_LIVES * 2):
+        if app.game.game_over:
+            break
+        yield from run_and_jump(app, 30)
+        app.game.player.rect.center = app.game.enemies.rects()[0].center
+        yield [], 0, (0, 0)
+    else:
+        raise RuntimeError("game over jamais atteint")
+    yield from idle(60)
+
+    # Recommencer, puis sortie de chaque niveau (dialogue des sirènes au changement de biome)
+    yield [key_event(pygame.K_r)], 0, (0, 0)
+    for _ in range(app.game.max_levels * 2):
+        if app.game.victory:
+            break
+        yield from skip_dialogue(app)
+        yield from run_and_jump(app, 30)
+        app.game.player.rect.center = app.game.exit_door.rect.center
+        yield [], 0, (0, 0)
+    else:
+        raise RuntimeError("victoire jamais atteinte")
+    yield from idle(60)
+
+# --- MESURES ---
+
+def summarize(samples_ns):
+    ms = np.asarray(samples_ns, dtype=np.float64) / 1e6
+    stats = {f"p{p}": round(float(v), 4) for p, v in zip(PERCENTILES, np.percentile(ms, PERCENTILES))}
+    stats["mean"] = round(float(ms.mean()), 4)
+    stats["max"] = round(float(ms.max()), 4)
+    return stats
+
+def run_benchmark(seed=0, repeat=1, play_frames=240, enemy_count=10, level_length=1):
+    """Joue la séquence scriptée `repeat` fois, renvoie les statistiques par état (temps en ms)"""
+    pf.init_display()
+    timings = {scene: {"update": [], "draw": [], "present": []} for scene in SCENES}
+    frames = 0
+    for _ in range(repeat):
+        # Messages de chargement sur stderr : stdout ne contient que le JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            app = pf.App(seed=seed, enemy_count=enemy_count, level_length=level_length)
+        clock = time.perf_counter_ns
+        for events, held, mouse_pos in script(app, play_frames):
+            profiler.begin_frame()
+            t0 = clock()
+            with profiler.scope("update"):
+                app.update(events, held, mouse_pos)
+            t1 = clock()
+            with profiler.scope("draw"):
+                dirty_rects = app.draw(pf.window)
+            t2 = clock()
+            with profiler.scope("present"):
+                pf.present(dirty_rects)
+            t3 = clock()
+            profiler.end_frame()
+            scene = timings[app.scene]
+            scene["update"].append(t1 - t0)
+            scene["draw"].append(t2 - t1)
+            scene["present"].append(t3 - t2)
+            frames += 1
+
+    scenes = {}
+    for name, samples in timings.items():
+        if samples["update"]:
+            scenes[name] = {"frames": len(samples["update"])}
+            scenes[name].update({f"{phase}_ms": summarize(s) for phase, s in samples.items()})
+    return {
+        "version": BENCH_VERSION,
+        "seed": seed,
+        "level_length": level_length,
+        "repeat": repeat,
+        "frames": frames,
+        "environment": {
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "video_driver": pygame.display.get_driver(),
+        },
+        "scenes": scenes,
+    }
+
+def compare(result, baseline, tolerance, min_delta_ms=0.05):
+    """Affiche p50/p95 par état et phase par rapport à baseline ; renvoie les régressions de p95
+    (au-delà de la tolérance relative et d'au moins min_delta_ms, sous lequel on mesure du bruit)"""
+    regressions = []
+    for name, scene in result["scenes"].items():
+        base = baseline.get("scenes", {}).get(name)
+        if not base:
+            continue
+        for phase in ("update_ms", "draw_ms"):
+            new, old = scene[phase], base[phase]
+            ratio = new["p95"] / old["p95"] if old["p95"] else 1.0
+            print(f"{name:>10} {phase:<10} p50 {old['p50']:8.3f} -> {new['p50']:8.3f}   "
+                  f"p95 {old['p95']:8.3f} -> {new['p95']:8.3f}  ({ratio:5.2f}x)")
+            if ratio > 1 + tolerance and new["p95"] - old["p95"] >= min_delta_ms:
+                regressions.append((name, phase, ratio))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark déterministe des temps de frame")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="nombre de parties jouées")
+    parser.add_argument("--play-frames", type=int, default=240, help="frames de course au premier niveau")
+    parser.add_argument("--enemies", type=int, default=10, help="ennemis par niveau")
+    parser.add_argument("--level-length", type=int, default=1, help="écrans par niveau (niveaux longs)")
+    parser.add_argument("--out", help="fichier JSON de sortie (stdout par défaut)")
+    parser.add_argument("--compare", help="résultats JSON de référence")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="régression de p95 tolérée (0.2 = +20%%)")
+    parser.add_argument("--trace", help="active le profileur et exporte la dernière partie en Chrome trace")
+    parser.add_argument("--min-delta", type=float, default=0.05, help="écart de p95 ignoré en dessous (ms)")
+    args = parser.parse_args(argv)
+
+    if args.trace:
+        profiler.enabled = True
+    result = run_benchmark(args.seed, args.repeat, args.play_frames, args.enemies, args.level_length)
+    if args.trace:
+        profiler.export_chrome_trace(args.trace)
+    text = json.dumps(result, indent=2, sort_keys=True)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    elif not args.compare:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance, args.min_delta)
+        for name, phase, ratio in regressions:
+            print(f"! Régression : {name} {phase} p95 x{ratio:.2f}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
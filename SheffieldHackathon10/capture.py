@@ -0,0 +1,147 @@
+"""Capture des frames rendues : vue NumPy sur les pixels de la fenêtre (sans copie), et écriture
+des frames dans un fichier sur un thread de fond (vidéo via ffmpeg, ou RGB brut).
+
+    capture = FrameCapture(window, scale=2)
+    with capture.view() as frame:            # uint8[hauteur, largeur, 3], vue sur la surface
+        ...
+    sink = open_sink("trailer.mp4", capture.size)
+    capture.push(sink)                       # après chaque present()
+    sink.close()
+
+La vue verrouille la surface : elle n'est valide qu'à l'intérieur du bloc with. Un sink copie chaque
+frame dans un tampon préalloué (seule copie) puis le thread d'écriture l'envoie sur disque ; si le
+disque ne suit pas, la frame est abandonnée (compteur dropped) plutôt que de bloquer le rendu, sauf
+avec push(..., block=True) qui attend un slot libre (aucune frame perdue).
+"""
+import abc
+import json
+import queue
+import shutil
+import subprocess
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pygame
+
+CAPTURE_FPS = 60
+
+class FrameCapture:
+    """Pixels de surface en tableau (hauteur, largeur, 3). scale : réduction entière (1 pixel sur scale)"""
+    def __init__(self, surface, scale=1):
+        self.surface = surface
+        self.scale = scale
+        width, height = surface.get_size()
+        self.size = (-(-width // scale), -(-height // scale))
+
+    @contextmanager
+    def view(self):
+        pixels = pygame.surfarray.pixels3d(self.surface)
+        try:
+            # surfarray est indexé (x, y) : transposition et sous-échantillonnage ne sont que des pas de vue
+            yield pixels.swapaxes(0, 1)[::self.scale, ::self.scale]
+        finally:
+            # La surface reste verrouillée tant qu'une vue existe
+            del pixels
+
+    def push(self, sink, block=False):
+        with self.view() as frame:
+            return sink.push(frame, block)
+
+class FrameSink(abc.ABC):
+    """Écriture asynchrone des frames : slots tampons préalloués, remplis par push() sur le thread de rendu
+    et vidés par write() (à définir par les sous-classes) sur le thread d'écriture"""
+    def __init__(self, size, slots=8):
+        width, height = size
+        self.buffers = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(slots)]
+        self.free = queue.Queue()
+        for i in range(slots): self.free.put(i)
+        self.ready = queue.Queue()
+        self.frames = 0
+        self.dropped = 0
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name="frame-writer", daemon=True)
+        self.thread.start()
+
+    def push(self, frame, block=False):
+        """Copie frame dans un slot libre ; si tous sont en attente d'écriture, attend qu'un slot se libère
+        (block) ou abandonne la frame et renvoie False"""
+        try:
+            slot = self.free.get() if block else self.free.get_nowait()
+        except queue.Empty:
+            self.dropped += 1
+            return False
+        np.copyto(self.buffers[slot], frame)
+        self.ready.put(slot)
+        return True
+
+    def _run(self):
+        while True:
+            slot = self.ready.get()
+            if slot is None:
+                break
+            try:
+                if self.error is None:
+                    self.write(self.buffers[slot])
+                    self.frames += 1
+            except OSError as e:
+                self.error = e
+            self.free.put(slot)
+
+    @abc.abstractmethod
+    def write(self, frame):
+        """Écrit une frame (appelé sur le thread d'écriture)"""
+
+    def close(self):
+        self.ready.put(None)
+        self.thread.join()
+        self.finish()
+        if self.error:
+            print(f"! Capture interrompue : {self.error}")
+        return self.frames
+
+    def finish(self):
+        pass
+
+class RawSink(FrameSink):
+    """Frames RGB 8 bits brutes à la suite, description (taille, fps, nombre de frames) dans path + ".json".
+    Lisible par ffmpeg : -f rawvideo -pix_fmt rgb24 -s LxH -r fps -i path"""
+    def __init__(self, path, size, fps=CAPTURE_FPS, slots=8):
+        self.path = path
+        self.fps = fps
+        self.file = open(path, "wb")
+        super().__init__(size, slots)
+
+    def write(self, frame):
+        self.file.write(memoryview(frame).cast("B"))
+
+    def finish(self):
+        self.file.close()
+        height, width, _ = self.buffers[0].shape
+        with open(self.path + ".json", "w") as f:
+            json.dump({"width": width, "height": height, "fps": self.fps, "pix_fmt": "rgb24",
+                       "frames": self.frames, "dropped": self.dropped}, f)
+
+class VideoSink(FrameSink):
+    """Vidéo encodée par un processus ffmpeg qui lit les frames brutes sur son entrée standard"""
+    def __init__(self, path, size, fps=CAPTURE_FPS, slots=8):
+        width, height = size
+        self.process = subprocess.Popen(
+            ["ffmpeg", "-loglevel", "error", "-y", "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}",
+             "-r", str(fps), "-i", "-", "-pix_fmt", "yuv420p", path], stdin=subprocess.PIPE)
+        super().__init__(size, slots)
+
+    def write(self, frame):
+        self.process.stdin.write(memoryview(frame).cast("B"))
+
+    def finish(self):
+        self.process.stdin.close()
+        self.process.wait()
+
+def open_sink(path, size, fps=CAPTURE_FPS):
+    """Fichier .rgb / .raw : RawSink ; autre extension : VideoSink (ffmpeg requis)"""
+    if path.endswith((".rgb", ".raw")):
+        return RawSink(path, size, fps)
+    if not shutil.which("ffmpeg"):
+        raise RuntimeError("ffmpeg introuvable : utilisez un fichier .rgb (frames brutes)")
+    return VideoSink(path, size, fps)
@@ -0,0 +1,164 @@
+"""Pack de contenu : niveaux (grilles de tuiles, apparitions), dialogues et biomes dans un seul fichier
+binaire compact, projeté en mémoire (mmap). Seuls l'en-tête et les biomes sont lus à l'ouverture ;
+un niveau n'est décompressé que lorsqu'il est demandé, et le pack n'en garde aucun.
+
+    pack = ContentPack("campagne.jocp")
+    level = pack.level(1)              # LevelData : tuiles, ennemis, douches, sortie
+    lines = pack.dialogue("sirens")    # [(orateur, texte)]
+
+Format (petit-boutiste) : en-tête, tables des biomes, des dialogues et des niveaux, table des chaînes
+(décalages puis UTF-8), puis les données : répliques en paires d'indices de chaînes (orateur, texte),
+et niveaux compressés par zlib (en-tête, tuiles uint8 ligne par ligne, positions int32).
+"""
+import mmap
+import os
+import struct
+import zlib
+
+import numpy as np
+
+PACK_MAGIC = b"JOCP"
+PACK_VERSION = 1
+TILE_EMPTY, TILE_WALL, TILE_BLOCK = 0, 1, 2
+NO_STRING = 0xFFFF
+
+# magie, version, biomes, dialogues, niveaux, chaînes
+_HEADER = struct.Struct("<4sHHHHH")
+# nom, fond, ennemi (indices de chaînes), taille de l'ennemi, dialogue d'entrée (ou NO_STRING), niveaux
+_BIOME = struct.Struct("<HHHHHHH")
+# nom, décalage et nombre des répliques
+_DIALOGUE = struct.Struct("<HII")
+# décalage et taille du niveau compressé
+_LEVEL = struct.Struct("<II")
+# colonnes, lignes, ennemis, douches, sortie (x, y, largeur, hauteur)
+_LEVEL_HEADER = struct.Struct("<HHHHiiii")
+_LINE = struct.Struct("<HH")
+_POINT = np.dtype("<i4")
+
+class LevelData:
+    """Un niveau : tuiles (uint8[lignes, colonnes], valeurs TILE_*), coins haut gauche des ennemis
+    et des douches en pixels (int32[n, 2]) et rect (x, y, largeur, hauteur) de la sortie"""
+    __slots__ = ("tiles", "enemies", "showers", "exit")
+
+    def __init__(self, tiles, enemies, showers, exit_rect):
+        self.tiles = np.asarray(tiles, dtype=np.uint8)
+        self.enemies = np.asarray(enemies, dtype=_POINT).reshape(-1, 2)
+        self.showers = np.asarray(showers, dtype=_POINT).reshape(-1, 2)
+        self.exit = tuple(int(v) for v in exit_rect)
+
+    def encode(self):
+        rows, cols = self.tiles.shape
+        header = _LEVEL_HEADER.pack(cols, rows, len(self.enemies), len(self.showers), *self.exit)
+        return zlib.compress(header + self.tiles.tobytes() + self.enemies.tobytes() + self.showers.tobytes(), 9)
+
+    @classmethod
+    def decode(cls, data):
+        raw = zlib.decompress(data)
+        if len(raw) < _LEVEL_HEADER.size:
+            raise ValueError("niveau corrompu")
+        cols, rows, enemies, showers, *exit_rect = _LEVEL_HEADER.unpack_from(raw)
+        if len(raw) != _LEVEL_HEADER.size + rows * cols + (enemies + showers) * 2 * _POINT.itemsize:
+            raise ValueError("niveau corrompu")
+        pos = _LEVEL_HEADER.size
+        tiles = np.frombuffer(raw, np.uint8, rows * cols, pos).reshape(rows, cols)
+        pos += rows * cols
+        enemy_pos = np.frombuffer(raw, _POINT, enemies * 2, pos)
+        pos += enemies * 2 * _POINT.itemsize
+        return cls(tiles, enemy_pos, np.frombuffer(raw, _POINT, showers * 2, pos), exit_rect)
+
+def write_content_pack(path, biomes, dialogues, levels):
+    """biomes : dicts de réglages (clés name, background, enemy, enemy_size, dialogue, levels) ;
+    dialogues : nom -> [(orateur, texte)] ; levels : LevelData dans l'ordre du jeu"""
+    if sum(biome['levels'] for biome in biomes) != len(levels):
+        raise ValueError("le nombre de niveaux ne correspond pas aux biomes")
+    strings, ids = [], {}
+    def intern(text):
+        if text not in ids:
+            ids[text] = len(strings)
+            strings.append(text.encode("utf-8"))
+        return ids[text]
+
+    biome_table = b"".join(_BIOME.pack(intern(b['name']), intern(b['background']), intern(b['enemy']), *b['enemy_size'],
+                                       intern(b['dialogue']) if b.get('dialogue') else NO_STRING, b['levels'])
+                           for b in biomes)
+    names = [intern(name) for name in dialogues]
+    line_blobs = [b"".join(_LINE.pack(intern(speaker), intern(text)) for speaker, text in lines)
+                  for lines in dialogues.values()]
+    if len(strings) >= NO_STRING:
+        raise ValueError("trop de chaînes dans le pack")
+    level_blobs = [level.encode() for level in levels]
+
+    string_offsets = [0]
+    for s in strings: string_offsets.append(string_offsets[-1] + len(s))
+    offset = (_HEADER.size + len(biome_table) + len(names) * _DIALOGUE.size + len(levels) * _LEVEL.size
+              + 4 * len(string_offsets) + string_offsets[-1])
+    dialogue_table, level_table = [], []
+    for name, blob in zip(names, line_blobs):
+        dialogue_table.append(_DIALOGUE.pack(name, offset, len(blob) // _LINE.size))
+        offset += len(blob)
+    for blob in level_blobs:
+        level_table.append(_LEVEL.pack(offset, len(blob)))
+        offset += len(blob)
+
+    with open(path + ".tmp", "wb") as f:
+        f.write(_HEADER.pack(PACK_MAGIC, PACK_VERSION, len(biomes), len(names), len(levels), len(strings)))
+        f.write(biome_table)
+        f.write(b"".join(dialogue_table))
+        f.write(b"".join(level_table))
+        f.write(struct.pack(f"<{len(string_offsets)}I", *string_offsets))
+        for blob in strings + line_blobs + level_blobs: f.write(blob)
+    os.replace(path + ".tmp", path)
+    return path
+
+class ContentPack:
+    """Pack ouvert en lecture. biomes : réglages des biomes (mêmes clés que write_content_pack) ;
+    level(n) et dialogue(name) décodent à chaque appel depuis le fichier projeté."""
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.data = data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(data) < _HEADER.size:
+            raise ValueError("pack de contenu tronqué")
+        magic, version, biome_count, dialogue_count, self.level_count, string_count = _HEADER.unpack_from(data)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            raise ValueError("format de pack de contenu inconnu")
+        pos = _HEADER.size
+        biomes = [_BIOME.unpack_from(data, pos + i * _BIOME.size) for i in range(biome_count)]
+        pos += biome_count * _BIOME.size
+        dialogues = [_DIALOGUE.unpack_from(data, pos + i * _DIALOGUE.size) for i in range(dialogue_count)]
+        pos += dialogue_count * _DIALOGUE.size
+        self.level_table = pos
+        pos += self.level_count * _LEVEL.size
+        self.string_offsets = struct.unpack_from(f"<{string_count + 1}I", data, pos)
+        self.string_base = pos + 4 * (string_count + 1)
+
+        self.biomes = [{'name': self.string(name), 'background': self.string(background), 'enemy': self.string(enemy),
+                        'enemy_size': (width, height),
+                        'dialogue': None if dialogue == NO_STRING else self.string(dialogue), 'levels': levels}
+                       for name, background, enemy, width, height, dialogue, levels in biomes]
+        if sum(biome['levels'] for biome in self.biomes) != self.level_count:
+            raise ValueError("pack de contenu corrompu")
+        self.dialogues = {self.string(name): (offset, count) for name, offset, count in dialogues}
+
+    def string(self, index):
+        start, end = self.string_offsets[index], self.string_offsets[index + 1]
+        return self.data[self.string_base + start:self.string_base + end].decode("utf-8")
+
+    def dialogue(self, name):
+        """Répliques [(orateur, texte)] du dialogue (KeyError s'il n'existe pas)"""
+        offset, count = self.dialogues[name]
+        return [(self.string(speaker), self.string(text))
+                for speaker, text in _LINE.iter_unpack(self.data[offset:offset + count * _LINE.size])]
+
+    def level(self, number):
+        """Niveau `number` (à partir de 1), décompressé à chaque appel"""
+        if not 1 <= number <= self.level_count:
+            raise IndexError(number)
+        offset, length = _LEVEL.unpack_from(self.data, self.level_table + (number - 1) * _LEVEL.size)
+        return LevelData.decode(self.data[offset:offset + length])
+
+    def close(self):
+        self.data.close()
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
@@ -2,9 +2,20 @@ import pygame
 import sys
 import os
 import random
-import math
+import json
+import mmap
+import struct
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict, deque
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+import numpy as np
 
-pygame.init()
+from profiler import profiler, ProfilerOverlay
+from replay import Replay
+from capture import FrameCapture, open_sink
+from content_pack import ContentPack, LevelData, write_content_pack, TILE_WALL, TILE_BLOCK
 
 # Configuration
 WIDTH, HEIGHT = 960, 640
@@ -12,10 +23,41 @@ FPS = 60
 PLAYER_VEL = 6
 TILE_SIZE = 32
 MAX_LIVES = 5
-aah_sound= pygame.mixer.Sound("ahh.wav")
+WORLD_RECT = pygame.Rect(0, 0, WIDTH, HEIGHT)
 
-window = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("The Java Odyssey")
+# Tailles des hitbox (= taille des sprites chargés), utilisées aussi sans sprite en mode headless
+PLAYER_SIZE = (32, 32)
+CYCLOPS_SIZE = (32, 32)
+MIRO_SIZE = (64, 64)
+HEART_SIZE = (48, 48)
+SHOWER_SIZE = (48, 48)
+
+# Point d'apparition du joueur (début de niveau, après un coup)
+PLAYER_START = (100, HEIGHT - 200)
+
+# Entrées d'une frame pour Game.step (combinaison de bits)
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_JUMP = 4
+INPUT_RESTART = 8
+
+# Fenêtre et son : créés par init_display(), jamais à l'import (mode headless)
+window = None
+aah_sound = None
+
+def init_display(vsync=False):
+    """Initialise pygame, la fenêtre et le son. vsync : présentation synchronisée sur l'écran"""
+    global window, aah_sound
+    pygame.init()
+    # La synchronisation verticale passe par le renderer SDL (mode SCALED)
+    window = pygame.display.set_mode((WIDTH, HEIGHT), pygame.SCALED if vsync else 0, vsync=int(vsync))
+    pygame.display.set_caption("The Java Odyssey")
+    try:
+        aah_sound = pygame.mixer.Sound(os.path.join(os.path.dirname(os.path.abspath(__file__)), "ahh.wav"))
+    except pygame.error:
+        # Pas de périphérique audio (machine de build, serveur) : jeu sans son
+        aah_sound = None
+    return window
 
 # Couleurs
 BLACK = (0, 0, 0)
@@ -28,22 +70,25 @@ DIALOGUE_BG = (20, 20, 40, 200)
 HADES_GOLD = (255, 215, 0)
 HADES_HIGHLIGHT = (255, 255, 255, 50)
 
+def resolve_asset(filename):
+    """Chemin du fichier dans assets/ (dossier courant puis dossier du script), None s'il n'existe pas"""
+    for asset_path in (os.path.join("assets", filename),
+                       os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", filename)):
+        if os.path.isfile(asset_path):
+            return asset_path
+    return None
+
 def load_sprite(filename, scale=None):
     """Charge un sprite et le redimensionne si besoin"""
-    possible_paths = [
-        os.path.join("assets", filename),
-        f"assets/{filename}",
-        os.path.join(os.path.dirname(__file__), "assets", filename)
-    ]
-    
-    for sprite_path in possible_paths:
+    sprite_path = resolve_asset(filename)
+    if sprite_path:
         try:
             sprite = pygame.image.load(sprite_path).convert_alpha()
             if scale:
                 sprite = pygame.transform.scale(sprite, scale)
             return sprite
-        except Exception:
-            continue
+        except pygame.error:
+            pass
     print(f"✗ Échec du chargement de '{filename}'")
     return None
 
@@ -56,11 +101,11 @@ def load_menu_background():
     print("! menu_hades.png introuvable.")
     return None
 
-def load_player_sprite(): return load_sprite("player.png", (32, 32))
-def load_heart_sprite(): return load_sprite("heart.png", (48, 48))  # Agrandi
-def load_cyclops_sprite(): return load_sprite("cyclope.png", (32, 32))
-def load_miro_sprite(): return load_sprite("miro.png", (64, 64))
-def load_shower_sprite(): return load_sprite("shower.png", (48, 48))
+def load_player_sprite(): return load_sprite("player.png", PLAYER_SIZE)
+def load_heart_sprite(): return load_sprite("heart.png", HEART_SIZE)  # Agrandi
+def load_cyclops_sprite(): return load_sprite("cyclope.png", CYCLOPS_SIZE)
+def load_miro_sprite(): return load_sprite("miro.png", MIRO_SIZE)
+def load_shower_sprite(): return load_sprite("shower.png", SHOWER_SIZE)
 def load_Odysseus_portrait(): return load_sprite("ulysse.png")
 def load_cyclops_portrait(): return load_sprite("cyclope_portrait.png")
 def load_siren1_portrait(): return load_sprite("siren1.png")
@@ -93,18 +138,12 @@ def load_ocean_background():
     return bg
 
 def load_tileset():
-    possible_paths = [
-        os.path.join("assets", "tileset.png"),
-        "assets/tileset.png",
-        os.path.join(os.path.dirname(__file__), "assets", "tileset.png")
-    ]
-    for tileset_path in possible_paths:
+    tileset_path = resolve_asset("tileset.png")
+    if tileset_path:
         try:
             tileset = pygame.image.load(tileset_path).convert_alpha()
             tiles = {}
-            tileset_width = tileset.get_width() // 16
-            tileset_height = tileset.get_height() // 16
-            
+
             tile_surface = pygame.Surface((16, 16), pygame.SRCALPHA)
             rect = pygame.Rect(0, 0, 16, 16)
             tile_surface.blit(tileset, (0, 0), rect)
@@ -112,24 +151,284 @@ def load_tileset():
             tiles['block'] = tile_surface
             tiles['wall'] = tile_surface
             return tiles
-        except Exception:
-            continue
-    
+        except pygame.error:
+            pass
+
     default_tile = pygame.Surface((TILE_SIZE, TILE_SIZE))
     default_tile.fill(BROWN)
     pygame.draw.rect(default_tile, (100, 60, 10), default_tile.get_rect(), 2)
     return {'block': default_tile, 'wall': default_tile}
 
+# --- BUNDLE D'ASSETS ---
+# Tous les sprites de main() déjà résolus, redimensionnés et découpés, dans un seul fichier cache.
+# Chaque entrée est validée par le mtime de sa source et sa taille cible ; seules les entrées
+# périmées sont reconstruites.
+
+ASSET_BUNDLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".asset_cache", "sprites.bundle")
+ASSET_BUNDLE_MAGIC = b"JOAB"
+ASSET_BUNDLE_VERSION = 1
+
+# nom -> (fichier source, taille cible, fonction de chargement)
+ASSET_SPECS = {
+    'menu_bg': ("menu_hades.png", (WIDTH, HEIGHT), load_menu_background),
+    'cave_bg': ("background.png", (WIDTH, HEIGHT), load_background),
+    'ocean_bg': ("ocean_background.png", (WIDTH, HEIGHT), load_ocean_background),
+    'tile': ("tileset.png", (TILE_SIZE, TILE_SIZE), lambda: load_tileset()['block']),
+    'player': ("player.png", PLAYER_SIZE, load_player_sprite),
+    'heart': ("heart.png", HEART_SIZE, load_heart_sprite),
+    'shower': ("shower.png", SHOWER_SIZE, load_shower_sprite),
+    'cyclops': ("cyclope.png", CYCLOPS_SIZE, load_cyclops_sprite),
+    'miro': ("miro.png", MIRO_SIZE, load_miro_sprite),
+    'Odysseus_portrait': ("ulysse.png", None, load_Odysseus_portrait),
+    'cyclops_portrait': ("cyclope_portrait.png", None, load_cyclops_portrait),
+    'siren1_portrait': ("siren1.png", None, load_siren1_portrait),
+    'siren2_portrait': ("siren2.png", None, load_siren2_portrait),
+    'game_over': ("game_over_img.png", None, load_game_over_image),
+    'victory': ("absolute_cinema.jpg", None, load_victory_image),
+}
+
+def asset_key(filename, scale):
+    asset_path = resolve_asset(filename)
+    return [filename, os.stat(asset_path).st_mtime_ns if asset_path else None, list(scale) if scale else None]
+
+def read_asset_bundle(path=ASSET_BUNDLE_PATH):
+    """Projette le bundle en mémoire (mmap) : nom -> (clé, taille, mode, pixels). {} si absent ou invalide.
+    Seules les pages des images réellement décodées deviennent résidentes."""
+    try:
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return {}
+    if len(data) < 12 or data[:4] != ASSET_BUNDLE_MAGIC:
+        return {}
+    version, index_len = struct.unpack_from("<II", data, 4)
+    if version != ASSET_BUNDLE_VERSION:
+        return {}
+    blobs = memoryview(data)[12 + index_len:]
+    entries = {}
+    for name, e in json.loads(data[12:12 + index_len]).items():
+        size = tuple(e['size']) if e['size'] else None
+        entries[name] = (e['key'], size, e['mode'], blobs[e['offset']:e['offset'] + e['length']])
+    return entries
+
+def surface_entry(name, surface):
+    """Entrée de bundle (clé, taille, mode, pixels) pour une surface chargée (ou None si le fichier manque)"""
+    filename, scale, _ = ASSET_SPECS[name]
+    if surface is None:
+        return asset_key(filename, scale), None, None, b""
+    mode = "RGBA" if surface.get_flags() & pygame.SRCALPHA else "RGB"
+    return asset_key(filename, scale), surface.get_size(), mode, pygame.image.tobytes(surface, mode)
+
+def write_asset_bundle(entries, path=ASSET_BUNDLE_PATH):
+    """Écrit les entrées encore valides (clé à jour) dans le bundle"""
+    index, blobs, offset = {}, [], 0
+    for name, (filename, scale, _) in ASSET_SPECS.items():
+        if name not in entries or entries[name][0] != asset_key(filename, scale):
+            continue
+        key, size, mode, blob = entries[name]
+        index[name] = {'key': key, 'size': list(size) if size else None, 'mode': mode,
+                       'offset': offset, 'length': len(blob)}
+        blobs.append(blob)
+        offset += len(blob)
+    header = json.dumps(index).encode()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            f.write(ASSET_BUNDLE_MAGIC + struct.pack("<II", ASSET_BUNDLE_VERSION, len(header)) + header)
+            for blob in blobs: f.write(blob)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        print(f"! Impossible d'écrire le cache d'assets : {e}")
+
+class LazyAsset:
+    """Handle d'un asset du registre : rendu immédiatement, l'image n'est décodée qu'au premier get()"""
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    def get(self): return self.registry.get(self.name)
+
+class AssetRegistry:
+    """Assets de ASSET_SPECS décodés à la demande depuis le bundle (la fenêtre doit exister pour convert).
+    prefetch() décode en avance, sur un thread de fond, les assets de la scène suivante.
+    Les entrées absentes ou périmées sont rechargées depuis les fichiers ; save() réécrit alors le bundle."""
+    def __init__(self, path=ASSET_BUNDLE_PATH):
+        self.path = path
+        self.entries = read_asset_bundle(path)
+        self.surfaces = {}
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.executor = None
+        self.prefetched = set()
+
+    def handle(self, name):
+        if name not in ASSET_SPECS:
+            raise KeyError(name)
+        return LazyAsset(self, name)
+
+    def get(self, name, default=None):
+        """Surface de l'asset (None si le fichier manque) ; même usage qu'un dict de sprites"""
+        if name not in ASSET_SPECS:
+            return default
+        if name not in self.surfaces:
+            with self.lock:
+                if name not in self.surfaces:
+                    self.surfaces[name] = self._decode(name)
+        return self.surfaces[name]
+
+    def _decode(self, name):
+        filename, scale, loader = ASSET_SPECS[name]
+        entry = self.entries.get(name)
+        if entry and entry[0] == asset_key(filename, scale):
+            _, size, mode, blob = entry
+            if size is None:
+                return None
+            surface = pygame.image.frombuffer(blob, size, mode)
+            return surface.convert_alpha() if mode == "RGBA" else surface.convert()
+        surface = loader()
+        self.entries[name] = surface_entry(name, surface)
+        self.dirty = True
+        return surface
+
+    def prefetch(self, names):
+        """Décode les assets en arrière-plan ; les get() suivants sont instantanés"""
+        names = [n for n in names if n not in self.surfaces and n not in self.prefetched]
+        if not names:
+            return
+        self.prefetched.update(names)
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="asset-prefetch")
+        for name in names:
+            self.executor.submit(self.get, name)
+
+    def save(self):
+        """Réécrit le bundle si des entrées ont été reconstruites"""
+        if self.executor:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        if self.dirty:
+            write_asset_bundle(self.entries, self.path)
+            self.dirty = False
+
+def build_asset_bundle(path=ASSET_BUNDLE_PATH):
+    """Étape de build : reconstruit entièrement le bundle"""
+    if os.path.exists(path):
+        os.remove(path)
+    registry = AssetRegistry(path)
+    for name in ASSET_SPECS: registry.get(name)
+    registry.save()
+    return registry
+
+# --- CACHE DE TEXTE ---
+
+def wrap_text(font, text, max_width):
+    """Découpe text en lignes plus étroites que max_width (mot par mot)"""
+    lines = []
+    current_line = ""
+    for word in text.split():
+        test_line = current_line + word + " "
+        if font.size(test_line)[0] < max_width:
+            current_line = test_line
+        else:
+            lines.append(current_line)
+            current_line = word + " "
+    lines.append(current_line)
+    return lines
+
+class TextCache:
+    """Cache LRU des textes rendus, clé (police, texte, largeur, couleur).
+    Un texte n'est découpé (font.size) et rastérisé (font.render) qu'une fois tant qu'il reste dans le cache."""
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def lines(self, font, text, color, width=None):
+        """Surfaces des lignes de text ; width=None : une seule ligne, sans retour à la ligne"""
+        key = (font, text, width, color)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        wrapped = [text] if width is None else wrap_text(font, text, width)
+        rendered = [font.render(line, True, color) for line in wrapped]
+        self.entries[key] = rendered
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return rendered
+
+    def render(self, font, text, color):
+        return self.lines(font, text, color)[0]
+
+text_cache = TextCache()
+
+# --- CACHE DE TRANSFORMATIONS ---
+
+class TransformCache:
+    """Surfaces retournées / redimensionnées partagées, clé (surface source, flip x, flip y, taille).
+    Chaque transformation n'est calculée et convertie au format de l'écran qu'une fois : les ennemis,
+    le joueur et les portraits recréés à chaque niveau réutilisent la même surface.
+    LRU limité en octets de pixels (max_bytes). Appelé aussi depuis le thread du LevelPipeline."""
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, surface, flip_x=False, flip_y=False, size=None):
+        size = tuple(size) if size else None
+        key = (surface, flip_x, flip_y, size)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+        result = surface
+        if size and size != surface.get_size():
+            result = pygame.transform.scale(result, size)
+        if flip_x or flip_y:
+            result = pygame.transform.flip(result, flip_x, flip_y)
+        if pygame.display.get_surface():
+            result = result.convert_alpha() if surface.get_flags() & pygame.SRCALPHA else result.convert()
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = result
+                self.bytes += result.get_width() * result.get_height() * result.get_bytesize()
+            # La surface demandée reste en cache même seule au-delà de la limite
+            while self.bytes > self.max_bytes and len(self.entries) > 1:
+                _, old = self.entries.popitem(last=False)
+                self.bytes -= old.get_width() * old.get_height() * old.get_bytesize()
+            return self.entries[key]
+
+    def fit(self, surface, max_width, max_height):
+        """surface agrandie ou réduite (proportions gardées) pour tenir dans max_width x max_height"""
+        ratio = min(max_width / surface.get_width(), max_height / surface.get_height())
+        return self.get(surface, size=(int(surface.get_width() * ratio), int(surface.get_height() * ratio)))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+transform_cache = TransformCache()
+
 # --- CLASSE DU MENU PRINCIPAL ---
 class MainMenu:
     def __init__(self, background):
         self.background = background
         self.play_rect = pygame.Rect(95, 250, 280, 75)
         self.hovered = False
+        self.changed = False
+        self.highlight = pygame.Surface(self.play_rect.size, pygame.SRCALPHA)
+        self.highlight.fill(HADES_HIGHLIGHT)
 
-    def update(self, events):
-        mouse_pos = pygame.mouse.get_pos()
-        self.hovered = self.play_rect.collidepoint(mouse_pos)
+    def update(self, events, mouse_pos=None):
+        if mouse_pos is None:
+            mouse_pos = pygame.mouse.get_pos()
+        hovered = bool(self.play_rect.collidepoint(mouse_pos))
+        if hovered != self.hovered:
+            self.hovered = hovered
+            self.changed = True
 
         for event in events:
             if event.type == pygame.MOUSEBUTTONDOWN:
@@ -142,135 +441,179 @@ class MainMenu:
             surface.blit(self.background, (0, 0))
         else:
             surface.fill((30, 0, 0))
+        self._draw_button(surface)
+        self.changed = False
 
+    def _draw_button(self, surface):
         if self.hovered:
             pygame.draw.rect(surface, HADES_GOLD, self.play_rect, 3)
-            highlight = pygame.Surface((self.play_rect.width, self.play_rect.height), pygame.SRCALPHA)
-            highlight.fill(HADES_HIGHLIGHT)
-            surface.blit(highlight, self.play_rect.topleft)
+            surface.blit(self.highlight, self.play_rect.topleft)
+
+    def draw_dirty(self, surface, full=False):
+        """Ne redessine que le bouton quand le survol change ; retourne les rects à présenter ([] si rien)"""
+        if full:
+            self.draw(surface)
+            return [surface.get_rect()]
+        if not self.changed:
+            return []
+        # Restaure le fond sous le bouton puis redessine la surbrillance
+        if self.background:
+            surface.blit(self.background, self.play_rect, self.play_rect)
+        else:
+            surface.fill((30, 0, 0), self.play_rect)
+        self._draw_button(surface)
+        self.changed = False
+        return [self.play_rect]
+
+# --- CONTENU DU JEU ---
+# Contenu de la campagne procédurale. Un pack de contenu (content_pack.py) fournit les mêmes données.
+
+DIALOGUES = {
+    "Cyclops": [
+        ("Odysseus", "I am Odysseus, certified SCRUM MASTER, who are you creature?"),
+        ("Cyclops", "I am a Java Addict, son of IDE god!"),
+        ("Cyclops", "You haven't submitted your assignment on time... You will be my meal!"),
+        ("Odysseus", "I will not be devoured without a fight!"),
+        ("Odysseus", "I must escape from this Blackboard cave before she catches me and force me to do JAVA!"),
+    ],
+    "sirens": [
+        ("siren1", "Ohh... ARE YOU ALIVE ???"),
+        ("siren2", "Come my child, join us or else I'll Kirill you !"),
+        ("Odysseus", "Your voices are enchanting, but I know your traps!"),
+        ("siren1", "We want you to stay with us..IS THAT CLEAR TO YOU?????"),
+        ("Odysseus", "Never! I must find my way back to my coffee store!"),
+        ("siren2", "Then flee, mortal... If you can!"),
+    ],
+}
+SPEAKER_NAMES = {"Odysseus": "Odysseus", "Cyclops": "Cyclops", "siren1": "Siren", "siren2": "Siren"}
+# orateur -> asset du portrait
+PORTRAITS = {"Odysseus": 'Odysseus_portrait', "Cyclops": 'cyclops_portrait', "siren1": 'siren1_portrait',
+             "siren2": 'siren2_portrait'}
+# Orateur dont le portrait est à gauche dans les dialogues ; les autres se partagent la droite
+HERO_SPEAKER = "Odysseus"
+
+# Biomes dans l'ordre du jeu : fond et ennemi (assets de ASSET_SPECS), dialogue joué en y entrant, nombre de niveaux
+BIOMES = (
+    {'name': "Java Cave", 'background': 'cave_bg', 'enemy': 'cyclops', 'enemy_size': CYCLOPS_SIZE,
+     'dialogue': "Cyclops", 'levels': 3},
+    {'name': "Prosanta's Sea", 'background': 'ocean_bg', 'enemy': 'miro', 'enemy_size': MIRO_SIZE,
+     'dialogue': "sirens", 'levels': 3},
+)
+
+def dialogue_portraits(lines):
+    """Assets des portraits des orateurs de lines"""
+    return [PORTRAITS[speaker] for speaker in dict.fromkeys(speaker for speaker, _ in lines) if speaker in PORTRAITS]
 
 # --- CLASSES DU JEU ---
 
 class DialogueScene:
-    def __init__(self, background, dialogue_type="Cyclops", portraits=None):
+    """lines : répliques (DIALOGUES[dialogue_type] par défaut). Portraits placés d'après les orateurs : le héros
+    (ou à défaut le premier orateur) à gauche, les autres répartis sur la moitié droite dans l'ordre d'apparition"""
+    def __init__(self, background, dialogue_type="Cyclops", portraits=None, lines=None):
         self.background = background
         self.portraits = portraits or {}
         self.font = pygame.font.Font(None, 36)
         self.font_large = pygame.font.Font(None, 48)
         self.portrait_data = {}
+        self.dialogues = list(DIALOGUES.get(dialogue_type, []) if lines is None else lines)
         
-        if 'Odysseus' in self.portraits and self.portraits['Odysseus']:
-            portrait = self.portraits['Odysseus']
-            max_height = HEIGHT - 150
-            max_width = WIDTH // 2 - 100
-            ratio = min(max_width / portrait.get_width(), max_height / portrait.get_height())
-            scaled = pygame.transform.scale(portrait, (int(portrait.get_width() * ratio), int(portrait.get_height() * ratio)))
-            self.portrait_data['Odysseus'] = {'image': scaled, 'pos': (50, HEIGHT - scaled.get_height() - 140)}
-        
-        if dialogue_type == "Cyclops":
-            if 'Cyclops' in self.portraits and self.portraits['Cyclops']:
-                portrait = self.portraits['Cyclops']
-                max_height = HEIGHT - 150
-                max_width = WIDTH // 2 - 100
-                ratio = min(max_width / portrait.get_width(), max_height / portrait.get_height())
-                scaled = pygame.transform.scale(portrait, (int(portrait.get_width() * ratio), int(portrait.get_height() * ratio)))
-                self.portrait_data['Cyclops'] = {'image': scaled, 'pos': (WIDTH - scaled.get_width() - 50, HEIGHT - scaled.get_height() - 140)}
-            
-            self.dialogues = [
-                ("Odysseus", "I am Odysseus, certified SCRUM MASTER, who are you creature?"),
-                ("Cyclops", "I am a Java Addict, son of IDE god!"),
-                ("Cyclops", "You haven't submitted your assignment on time... You will be my meal!"),
-                ("Odysseus", "I will not be devoured without a fight!"),
-                ("Odysseus", "I must escape from this Blackboard cave before she catches me and force me to do JAVA!"),
-            ]
-        
-        elif dialogue_type == "sirens":
-            if 'siren1' in self.portraits and self.portraits['siren1']:
-                portrait = self.portraits['siren1']
-                max_height = HEIGHT - 150
-                max_width = WIDTH // 3 - 50
-                ratio = min(max_width / portrait.get_width(), max_height / portrait.get_height())
-                scaled = pygame.transform.scale(portrait, (int(portrait.get_width() * ratio), int(portrait.get_height() * ratio)))
-                self.portrait_data['siren1'] = {'image': scaled, 'pos': (WIDTH // 2 + 20, HEIGHT - scaled.get_height() - 140)}
-            
-            if 'siren2' in self.portraits and self.portraits['siren2']:
-                portrait = self.portraits['siren2']
-                max_height = HEIGHT - 150
-                max_width = WIDTH // 3 - 50
-                ratio = min(max_width / portrait.get_width(), max_height / portrait.get_height())
-                scaled = pygame.transform.scale(portrait, (int(portrait.get_width() * ratio), int(portrait.get_height() * ratio)))
-                self.portrait_data['siren2'] = {'image': scaled, 'pos': (WIDTH - scaled.get_width() - 50, HEIGHT - scaled.get_height() - 140)}
-            
-            self.dialogues = [
-                ("siren1", "Ohh... ARE YOU ALIVE ???"),
-                ("siren2", "Come my child, join us or else I'll Kirill you !"),
-                ("Odysseus", "Your voices are enchanting, but I know your traps!"),
-                ("siren1", "We want you to stay with us..IS THAT CLEAR TO YOU?????"),
-                ("Odysseus", "Never! I must find my way back to my coffee store!"),
-                ("siren2", "Then flee, mortal... If you can!"),
-            ]
-        
+        # Portraits redimensionnés une seule fois (transform_cache), partagés entre les scènes
+        speakers = [s for s in dict.fromkeys(speaker for speaker, _ in self.dialogues) if self.portraits.get(s)]
+        if HERO_SPEAKER in speakers:
+            speakers.remove(HERO_SPEAKER)
+            speakers.insert(0, HERO_SPEAKER)
+        if speakers:
+            scaled = transform_cache.fit(self.portraits[speakers[0]], WIDTH // 2 - 100, HEIGHT - 150)
+            self.portrait_data[speakers[0]] = {'image': scaled, 'pos': (50, HEIGHT - scaled.get_height() - 140)}
+        others = speakers[1:]
+        # Un seul orateur à droite : même taille qu'à gauche ; plusieurs : plus étroits, du milieu au bord droit
+        width = WIDTH // 2 - 100 if len(others) == 1 else WIDTH // 3 - 50
+        for i, speaker in enumerate(others):
+            scaled = transform_cache.fit(self.portraits[speaker], width, HEIGHT - 150)
+            right = WIDTH - scaled.get_width() - 50
+            x = right if len(others) == 1 else WIDTH // 2 + 20 + (right - WIDTH // 2 - 20) * i // (len(others) - 1)
+            self.portrait_data[speaker] = {'image': scaled, 'pos': (x, HEIGHT - scaled.get_height() - 140)}
         self.current_dialogue = 0
         self.finished = False
+        self.changed = False
+        self.shown_rects = []
+        
+        # Boîte de dialogue : fond translucide alloué une fois, textes découpés et rendus dès la construction
+        box_height = 120
+        self.box_rect = pygame.Rect(50, HEIGHT - box_height - 20, WIDTH - 100, box_height)
+        self.box_surface = pygame.Surface(self.box_rect.size, pygame.SRCALPHA)
+        self.box_surface.fill(DIALOGUE_BG)
+        self.text_width = self.box_rect.width - 40
+        for _, text in self.dialogues:
+            text_cache.lines(self.font, text, WHITE, self.text_width)
     
     def draw_dialogue_box(self, surface, text, speaker_name):
-        box_height = 120
-        box_rect = pygame.Rect(50, HEIGHT - box_height - 20, WIDTH - 100, box_height)
-        
-        dialogue_surface = pygame.Surface((box_rect.width, box_rect.height), pygame.SRCALPHA)
-        dialogue_surface.fill(DIALOGUE_BG)
-        surface.blit(dialogue_surface, box_rect.topleft)
+        box_rect = self.box_rect
+        surface.blit(self.box_surface, box_rect.topleft)
         pygame.draw.rect(surface, WHITE, box_rect, 3)
         
-        name_text = self.font_large.render(speaker_name, True, (255, 215, 0))
+        name_text = text_cache.render(self.font_large, speaker_name, (255, 215, 0))
         surface.blit(name_text, (box_rect.x + 20, box_rect.y + 10))
         
-        words = text.split()
-        lines = []
-        current_line = ""
-        for word in words:
-            test_line = current_line + word + " "
-            if self.font.size(test_line)[0] < box_rect.width - 40:
-                current_line = test_line
-            else:
-                lines.append(current_line)
-                current_line = word + " "
-        lines.append(current_line)
-        
         y_offset = box_rect.y + 55
-        for line in lines:
-            dialogue_text = self.font.render(line, True, WHITE)
+        for dialogue_text in text_cache.lines(self.font, text, WHITE, self.text_width):
             surface.blit(dialogue_text, (box_rect.x + 20, y_offset))
             y_offset += 35
         
-        hint_text = self.font.render("Press SPACE to continue...", True, GRAY)
+        hint_text = text_cache.render(self.font, "Press SPACE to continue...", GRAY)
         surface.blit(hint_text, (WIDTH - 380, HEIGHT - 30))
     
     def update(self, events):
         for event in events:
             if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
                 self.current_dialogue += 1
+                self.changed = True
                 if self.current_dialogue >= len(self.dialogues):
                     self.finished = True
     
     def draw(self, surface):
         surface.blit(self.background, (0, 0))
-        if self.current_dialogue < len(self.dialogues):
-            speaker, text = self.dialogues[self.current_dialogue]
-            speaker_names = {"Odysseus": "Odysseus", "Cyclops": "Cyclops", "siren1": "Siren", "siren2": "Siren"}
-            if speaker in self.portrait_data:
-                data = self.portrait_data[speaker]
-                surface.blit(data['image'], data['pos'])
-            self.draw_dialogue_box(surface, text, speaker_names.get(speaker, speaker))
-
-class Player(pygame.sprite.Sprite):
+        self.shown_rects = self._draw_page(surface)
+        self.changed = False
+
+    def _draw_page(self, surface):
+        """Dessine le portrait et la boîte de la réplique courante ; retourne les zones couvertes"""
+        if self.current_dialogue >= len(self.dialogues):
+            return []
+        rects = []
+        speaker, text = self.dialogues[self.current_dialogue]
+        if speaker in self.portrait_data:
+            data = self.portrait_data[speaker]
+            rects.append(surface.blit(data['image'], data['pos']))
+        self.draw_dialogue_box(surface, text, SPEAKER_NAMES.get(speaker, speaker))
+        # Boîte + consigne "Press SPACE" qui déborde sous la boîte
+        rects.append(self.box_rect.union(pygame.Rect(WIDTH - 380, HEIGHT - 30, 330, 30)))
+        return rects
+
+    def draw_dirty(self, surface, full=False):
+        """Ne redessine que l'ancien et le nouveau portrait et la boîte quand la réplique avance ;
+        retourne les rects à présenter ([] si rien n'a changé)"""
+        if full:
+            self.draw(surface)
+            return [surface.get_rect()]
+        if not self.changed:
+            return []
+        old_rects = self.shown_rects
+        for rect in old_rects:
+            surface.blit(self.background, rect, rect)
+        self.shown_rects = self._draw_page(surface)
+        self.changed = False
+        return old_rects + self.shown_rects
+
+class Player:
     GRAVITY = 0.5
-    JUMP_STRENGTH = -10
+    JUMP_STRENGTH = -12
+    MAX_FALL_SPEED = 15
+    __slots__ = ("width", "height", "rect", "x_vel", "y_vel", "jump_count", "on_ground", "direction",
+                 "sprite_image", "sprite_flipped", "lives", "wall_direction")
     
-    def __init__(self, x, y, sprite_image=None):
-        super().__init__()
-        self.width = 32
-        self.height = 32 if sprite_image else 48
+    def __init__(self, x, y, sprite_image=None, size=None):
+        self.width, self.height = size or (32, 32 if sprite_image else 48)
         self.rect = pygame.Rect(x, y, self.width, self.height)
         self.x_vel = 0
         self.y_vel = 0
@@ -278,18 +621,18 @@ class Player(pygame.sprite.Sprite):
         self.on_ground = False
         self.direction = 1
         self.sprite_image = sprite_image
-        self.sprite_flipped = pygame.transform.flip(sprite_image, True, False) if sprite_image else None
+        self.sprite_flipped = transform_cache.get(sprite_image, flip_x=True) if sprite_image else None
         self.lives = MAX_LIVES
         self.wall_direction = 0 # 0: Pas de mur, -1: Gauche, 1: Droite
         
     def jump(self):
         # SAUT MURAL (Wall Jump)
         if self.wall_direction != 0 and not self.on_ground:
-            self.y_vel = -12
+            self.y_vel = self.JUMP_STRENGTH
             self.jump_count = 0 # Réinitialise les sauts pour pouvoir enchainer
         # SAUT NORMAL / DOUBLE SAUT
         elif self.jump_count < 2:
-            self.y_vel = -12
+            self.y_vel = self.JUMP_STRENGTH
             self.jump_count += 1
             self.on_ground = False
     
@@ -298,35 +641,53 @@ class Player(pygame.sprite.Sprite):
         self.rect.y += dy
     
     def update(self, platforms):
-        self.y_vel = min(self.y_vel + self.GRAVITY, 15)
+        """platforms : PlatformGrid (ou ChunkedLevel) du niveau courant.
+        Chaque axe est balayé (swept AABB) : le déplacement s'arrête dans le premier obstacle rencontré,
+        quelle que soit la vitesse, puis le chevauchement est résolu comme avant. Sans traversée possible,
+        le résultat est identique à un déplacement complet suivi de la résolution."""
+        self.y_vel = min(self.y_vel + self.GRAVITY, self.MAX_FALL_SPEED)
         
         # Mouvement X
-        self.rect.x += self.x_vel
-        self._check_x_collisions(platforms)
+        start = self.rect.copy()
+        self.rect.x += self._sweep(platforms, self.x_vel, 0)
+        self._check_x_collisions(platforms.query(self.rect.union(start)))
         
-        # DÉTECTION DES MURS (pour le saut mural)
+        # DÉTECTION DES MURS (pour le saut mural) : le joueur est collé au mur après le balayage
         self.wall_direction = 0
-        
-        # Vérifie à droite
-        self.rect.x += 2
-        for p in platforms:
-            if self.rect.colliderect(p.rect):
-                self.wall_direction = 1
-        self.rect.x -= 2
-        
-        # Vérifie à gauche (seulement si pas de mur à droite)
-        if self.wall_direction == 0:
-            self.rect.x -= 2
-            for p in platforms:
-                if self.rect.colliderect(p.rect):
-                    self.wall_direction = -1
-            self.rect.x += 2
-
-        # Mouvement Y
-        self.rect.y += self.y_vel
+        nearby = platforms.query(self.rect.inflate(4, 0))
+        if self._touches(nearby, 2): self.wall_direction = 1
+        elif self._touches(nearby, -2): self.wall_direction = -1
+
+        # Mouvement Y (même arrondi que rect.y += y_vel)
+        start = self.rect.copy()
+        target = start.copy()
+        target.y += self.y_vel
+        self.rect.y += self._sweep(platforms, 0, target.y - start.y)
         self.on_ground = False
-        self._check_y_collisions(platforms)
-        self.rect.clamp_ip(window.get_rect())
+        self._check_y_collisions(platforms.query(self.rect.union(start)))
+        self.rect.clamp_ip(platforms.bounds)
+
+    def _sweep(self, platforms, dx, dy):
+        """Déplacement entier sur un seul axe, raccourci pour entrer d'1 pixel dans le premier obstacle
+        du trajet : la résolution des collisions le repousse ensuite au contact (et pose on_ground...)"""
+        rect = self.rect
+        limit = dx or dy
+        if not limit:
+            return 0
+        for p in platforms.query(rect.union(rect.move(dx, dy))):
+            r = p.rect
+            if dx and r.top < rect.bottom and r.bottom > rect.top:
+                if dx > 0 and r.left >= rect.right: limit = min(limit, r.left - rect.right + 1)
+                elif dx < 0 and r.right <= rect.left: limit = max(limit, r.right - rect.left - 1)
+            elif dy and r.left < rect.right and r.right > rect.left:
+                if dy > 0 and r.top >= rect.bottom: limit = min(limit, r.top - rect.bottom + 1)
+                elif dy < 0 and r.bottom <= rect.top: limit = max(limit, r.bottom - rect.top - 1)
+        return limit
+
+    def _touches(self, platforms, dx):
+        """Vrai si le joueur décalé de dx chevauche une plateforme (sonde des murs)"""
+        probe = self.rect.move(dx, 0)
+        return any(probe.colliderect(p.rect) for p in platforms)
     
     def check_collision_x(self, platforms):
         for platform in platforms:
@@ -352,354 +713,1850 @@ class Player(pygame.sprite.Sprite):
                     self.rect.top = p.rect.bottom
                     self.y_vel = 0
     
-    def draw(self, surface):
+    def draw(self, surface, offset=(0, 0)):
         if self.sprite_image:
             img = self.sprite_flipped if self.direction == -1 else self.sprite_image
-            surface.blit(img, (self.rect.x, self.rect.y))
+            surface.blit(img, (self.rect.x + offset[0], self.rect.y + offset[1]))
         else:
-            pygame.draw.rect(surface, (255, 0, 0), self.rect)
+            pygame.draw.rect(surface, (255, 0, 0), self.rect.move(offset))
 
-class Cyclops(pygame.sprite.Sprite):
+class CyclopsSwarm:
+    """Tous les ennemis d'un niveau, stockés dans des tableaux NumPy (positions, départs, directions).
+    Poursuite, test de collision avec le joueur et réinitialisation sont vectorisés :
+    le coût par frame ne dépend plus du nombre d'objets Python."""
     SPEED = 2
-    def __init__(self, x, y, sprite_image=None):
-        super().__init__()
-        width = sprite_image.get_width() if sprite_image else 32
-        height = sprite_image.get_height() if sprite_image else 32
-        self.rect = pygame.Rect(x, y, width, height)
-        self.start_x = x
-        self.start_y = y
+    __slots__ = ("width", "height", "start", "pos", "direction", "sprite_image", "sprite_flipped")
+
+    def __init__(self, spawns, sprite_image=None, size=None):
+        self.width, self.height = size or (sprite_image.get_size() if sprite_image else (32, 32))
+        # Positions entières stockées en float (comme pygame.Rect, arrondies à chaque pas)
+        self.start = np.array(spawns, dtype=np.float64).reshape(-1, 2)
+        self.pos = self.start.copy()
+        self.direction = np.ones(len(self.start), dtype=np.int8)
         self.sprite_image = sprite_image
-        self.sprite_flipped = pygame.transform.flip(sprite_image, True, False) if sprite_image else None
-        self.direction = 1
+        self.sprite_flipped = transform_cache.get(sprite_image, flip_x=True) if sprite_image else None
+
+    def __len__(self): return len(self.pos)
 
-    def update(self, player_rect):
-        dx = player_rect.centerx - self.rect.centerx
-        dy = player_rect.centery - self.rect.centery
-        dist = math.hypot(dx, dy)
-        if dist != 0:
-            self.rect.x += (dx / dist) * self.SPEED
-            self.rect.y += (dy / dist) * self.SPEED
-            self.direction = 1 if dx > 0 else -1
+    def update(self, player_rect, flows=None):
+        """Poursuite du joueur : en ligne droite, ou par le chemin du FlowField de la taille des ennemis
+        (flows : footprint -> FlowField) qui contourne les plateformes"""
+        centers = self.pos + (self.width // 2, self.height // 2)
+        target = np.array(player_rect.center, dtype=np.float64)
+        flow = flows.get(enemy_footprint(self.width, self.height)) if flows else None
+        if flow is not None:
+            target = flow.waypoints(centers, target)
+        delta = target - centers
+        dist = np.hypot(delta[:, 0], delta[:, 1])
+        moving = dist != 0
+        delta, dist = delta[moving], dist[moving, None]
+        # Même arrondi que pygame.Rect lors de "rect.x += float"
+        self.pos[moving] = np.floor(self.pos[moving] + delta / dist * self.SPEED + 0.5)
+        self.direction[moving] = np.where(delta[:, 0] > 0, 1, -1)
 
-    def reset_position(self):
-        self.rect.x = self.start_x
-        self.rect.y = self.start_y
+    def collides(self, rect):
+        """Vrai si au moins un ennemi touche rect (même règle que Rect.colliderect)"""
+        x, y = self.pos[:, 0], self.pos[:, 1]
+        return bool(np.any((x < rect.right) & (x + self.width > rect.left) &
+                           (y < rect.bottom) & (y + self.height > rect.top)))
+
+    def reset_positions(self):
+        self.pos[:] = self.start
+
+    def rects(self):
+        return [pygame.Rect(int(x), int(y), self.width, self.height) for x, y in self.pos]
+
+    def draw_one(self, surface, index, offset=(0, 0)):
+        x, y = int(self.pos[index, 0]) + offset[0], int(self.pos[index, 1]) + offset[1]
+        if self.sprite_image:
+            surface.blit(self.sprite_flipped if self.direction[index] == -1 else self.sprite_image, (x, y))
+        else:
+            pygame.draw.rect(surface, (150, 0, 150), (x, y, self.width, self.height))
 
     def draw(self, surface):
         if self.sprite_image:
-            img = self.sprite_flipped if self.direction == -1 else self.sprite_image
-            surface.blit(img, (self.rect.x, self.rect.y))
+            surface.blits([(self.sprite_flipped if d == -1 else self.sprite_image, (int(x), int(y)))
+                           for (x, y), d in zip(self.pos, self.direction)], False)
         else:
-            pygame.draw.rect(surface, (150, 0, 150), self.rect)
+            for rect in self.rects():
+                pygame.draw.rect(surface, (150, 0, 150), rect)
+
+# --- ENTITES ---
+# Classes à __slots__ (pas de __dict__ par instance). Plateformes, douches et sorties sont recyclées
+# d'un niveau à l'autre par des EntityPool : reset() réinitialise une instance libérée au lieu d'en allouer une.
+
+class EntityPool:
+    """Instances libérées d'une classe d'entités, réutilisées par acquire() (mêmes arguments que le constructeur).
+    acquire() est appelé sur le thread du LevelPipeline et release() sur le thread principal :
+    append/pop d'une deque sont atomiques."""
+    def __init__(self, cls, max_size=1024):
+        self.cls = cls
+        self.max_size = max_size
+        self.free = deque()
+
+    def acquire(self, *args):
+        try:
+            entity = self.free.pop()
+        except IndexError:
+            return self.cls(*args)
+        entity.reset(*args)
+        return entity
 
-class Heart(pygame.sprite.Sprite):
+    def release(self, entities):
+        for entity in entities:
+            if len(self.free) >= self.max_size:
+                break
+            self.free.append(entity)
+
+class Heart:
+    __slots__ = ("image", "rect")
     def __init__(self, x, y, sprite_image):
-        super().__init__()
         self.image = sprite_image
         self.rect = self.image.get_rect(topleft=(x, y))
     def draw(self, surface): surface.blit(self.image, self.rect)
 
-class Platform(pygame.sprite.Sprite):
+class Platform:
+    __slots__ = ("rect", "tile_image")
     def __init__(self, x, y, width, height, tile_image=None, tile_type=0):
-        super().__init__()
         self.rect = pygame.Rect(x, y, width, height)
         self.tile_image = tile_image
-    def draw(self, surface):
+    def reset(self, x, y, width, height, tile_image=None, tile_type=0):
+        self.rect.update(x, y, width, height)
+        self.tile_image = tile_image
+    def draw(self, surface, offset=(0, 0)):
+        rect = self.rect.move(offset)
         if self.tile_image:
-            for ty in range(self.rect.height // TILE_SIZE):
-                for tx in range(self.rect.width // TILE_SIZE):
-                    surface.blit(self.tile_image, (self.rect.x + tx * TILE_SIZE, self.rect.y + ty * TILE_SIZE))
+            for ty in range(rect.height // TILE_SIZE):
+                for tx in range(rect.width // TILE_SIZE):
+                    surface.blit(self.tile_image, (rect.x + tx * TILE_SIZE, rect.y + ty * TILE_SIZE))
         else:
-            pygame.draw.rect(surface, BROWN, self.rect)
-            pygame.draw.rect(surface, (100, 60, 10), self.rect, 2)
+            pygame.draw.rect(surface, BROWN, rect)
+            pygame.draw.rect(surface, (100, 60, 10), rect, 2)
+
+class PlatformGrid:
+    """Index spatial des plateformes : grille de cases de TILE_SIZE construite une fois par niveau.
+    Une requête ne teste que les plateformes des cases recouvertes par le rect."""
+    bounds = WORLD_RECT # limites du monde pour le joueur
+
+    def __init__(self, platforms, cell_size=TILE_SIZE):
+        self.platforms = list(platforms)
+        self.cell_size = cell_size
+        self.cells = {}
+        for index, p in enumerate(self.platforms):
+            for cell in self._cells_for(p.rect):
+                self.cells.setdefault(cell, []).append(index)
 
-class Shower(pygame.sprite.Sprite):
+    def _cells_for(self, rect):
+        cs = self.cell_size
+        for cy in range(rect.top // cs, (rect.bottom - 1) // cs + 1):
+            for cx in range(rect.left // cs, (rect.right - 1) // cs + 1):
+                yield cx, cy
+
+    def query(self, rect):
+        """Plateformes candidates pour rect, dans l'ordre de la liste d'origine
+        (même ordre de résolution qu'un parcours complet de la liste)"""
+        found = set()
+        for cell in self._cells_for(rect):
+            found.update(self.cells.get(cell, ()))
+        return [self.platforms[i] for i in sorted(found)]
+
+    def __iter__(self): return iter(self.platforms)
+    def __len__(self): return len(self.platforms)
+
+class Shower:
     """Douche qui redonne de la vie"""
+    __slots__ = ("rect", "sprite_image", "animation_frame")
     def __init__(self, x, y, sprite_image=None):
-        super().__init__()
         self.rect = pygame.Rect(x, y, 48, 48)
         self.sprite_image = sprite_image
         self.animation_frame = 0
+    def reset(self, x, y, sprite_image=None):
+        self.rect.topleft = (x, y)
+        self.sprite_image = sprite_image
+        self.animation_frame = 0
     
     def update(self):
         self.animation_frame = (self.animation_frame + 1) % 30
     
-    def draw(self, surface):
+    def draw(self, surface, offset=(0, 0)):
         if self.sprite_image:
-            surface.blit(self.sprite_image, (self.rect.x, self.rect.y))
+            surface.blit(self.sprite_image, (self.rect.x + offset[0], self.rect.y + offset[1]))
         else:
             # Fallback bleu
             color = [(100, 150, 255), (120, 170, 255), (140, 190, 255)][self.animation_frame // 10]
-            pygame.draw.rect(surface, color, self.rect)
+            pygame.draw.rect(surface, color, self.rect.move(offset))
 
-class Exit(pygame.sprite.Sprite):
+class Exit:
+    __slots__ = ("rect", "animation_frame")
     def __init__(self, x, y, width, height):
-        super().__init__()
         self.rect = pygame.Rect(x, y, width, height)
         self.animation_frame = 0
+    def reset(self, x, y, width, height):
+        self.rect.update(x, y, width, height)
+        self.animation_frame = 0
     def update(self): self.animation_frame = (self.animation_frame + 1) % 60
-    def draw(self, surface):
+    def draw(self, surface, offset=(0, 0)):
         glow = abs((self.animation_frame - 30)) / 30.0
         c_base = int(100 + glow * 100)
         color = (c_base, 200 + int(glow * 55), c_base)
-        pygame.draw.rect(surface, (80, 80, 80), self.rect, 4)
-        pygame.draw.rect(surface, color, self.rect.inflate(-8, -8))
+        rect = self.rect.move(offset)
+        pygame.draw.rect(surface, (80, 80, 80), rect, 4)
+        pygame.draw.rect(surface, color, rect.inflate(-8, -8))
 
-def generate_random_level(level_num, tiles, enemy_sprite, shower_sprite):
-    platforms, showers, enemy_list = [], [], []
-    platform_tile = tiles.get('block') if tiles else None
-    wall_tile = tiles.get('wall') if tiles else None
-    
-    # Bordures
-    for i in range(WIDTH // TILE_SIZE + 1):
-        platforms.append(Platform(i * TILE_SIZE, 0, TILE_SIZE, TILE_SIZE, wall_tile))
-        platforms.append(Platform(i * TILE_SIZE, TILE_SIZE, TILE_SIZE, TILE_SIZE, wall_tile))
-        platforms.append(Platform(i * TILE_SIZE, HEIGHT - TILE_SIZE, TILE_SIZE, TILE_SIZE, wall_tile))
-        platforms.append(Platform(i * TILE_SIZE, HEIGHT - TILE_SIZE * 2, TILE_SIZE, TILE_SIZE, wall_tile))
-    for i in range(HEIGHT // TILE_SIZE + 1):
-        platforms.append(Platform(0, i * TILE_SIZE, TILE_SIZE, TILE_SIZE, wall_tile))
-        platforms.append(Platform(TILE_SIZE, i * TILE_SIZE, TILE_SIZE, TILE_SIZE, wall_tile))
+platform_pool = EntityPool(Platform)
+shower_pool = EntityPool(Shower)
+exit_pool = EntityPool(Exit)
+
+def coalesce_tiles(cells):
+    """Fusion gloutonne de cases pleines {(colonne, ligne)} en rectangles (colonne, ligne, largeur, hauteur).
+    Chaque case est couverte par exactement un rectangle."""
+    remaining = set(cells)
+    rects = []
+    for row, col in sorted((row, col) for col, row in cells):
+        if (col, row) not in remaining: continue
+        w = 1
+        while (col + w, row) in remaining: w += 1
+        h = 1
+        while all((col + i, row + h) in remaining for i in range(w)): h += 1
+        for dy in range(h):
+            for dx in range(w):
+                remaining.discard((col + dx, row + dy))
+        rects.append((col, row, w, h))
+    return rects
+
+# Sortie : trou dans le mur de droite, à mi-hauteur (x, y, largeur, hauteur)
+EXIT_AREA = (WIDTH - TILE_SIZE * 2 - 32, HEIGHT // 2 - 64, 64, 128)
+
+def border_cells():
+    """Bordures : cases pleines (colonne, ligne), avec le trou de la sortie dans le mur de droite"""
+    wall_cells = set()
+    rows, cols = HEIGHT // TILE_SIZE, WIDTH // TILE_SIZE
+    for i in range(cols + 1):
+        wall_cells.update({(i, 0), (i, 1), (i, rows - 1), (i, rows - 2)})
+    for i in range(rows + 1):
+        wall_cells.update({(0, i), (1, i)})
     
     exit_start = (HEIGHT // 2) // TILE_SIZE - 2
-    for i in range(HEIGHT // TILE_SIZE + 1):
+    for i in range(rows + 1):
         if i < exit_start or i > exit_start + 4:
-            platforms.append(Platform(WIDTH - TILE_SIZE, i * TILE_SIZE, TILE_SIZE, TILE_SIZE, wall_tile))
-            platforms.append(Platform(WIDTH - TILE_SIZE * 2, i * TILE_SIZE, TILE_SIZE, TILE_SIZE, wall_tile))
+            wall_cells.update({(cols - 1, i), (cols - 2, i)})
+    return wall_cells
+
+def random_ledges(level_num, rng):
+    """Corniches du niveau (x, y, largeur), alignées sur les tuiles. Premiers tirages de rng :
+    le vérificateur d'atteignabilité les reproduit sans construire le niveau."""
+    ledges = []
+    for _ in range(12 + (level_num % 5)):
+        x = rng.randint(TILE_SIZE * 4, WIDTH - TILE_SIZE * 6)
+        y = rng.randint(TILE_SIZE * 4, HEIGHT - TILE_SIZE * 4)
+        x, y = (x // TILE_SIZE) * TILE_SIZE, (y // TILE_SIZE) * TILE_SIZE
+        ledges.append((x, y, rng.choice([64, 96, 128, 160])))
+    return ledges
+
+def generate_random_level(level_num, tiles, enemy_sprite, shower_sprite, enemy_size=None, rng=random, enemy_count=10,
+                          walls=None, x_offset=0):
+    """walls : cases pleines des bords (border_cells() par défaut) ; x_offset : position de l'écran
+    dans le monde (écrans d'un niveau long)"""
+    platforms, showers, enemy_spawns = [], [], []
+    platform_tile = tiles.get('block') if tiles else None
+    wall_tile = tiles.get('wall') if tiles else None
+    
+    # Platform.draw répète la tuile sur tout le rect : le rendu reste identique case par case
+    for col, row, w, h in coalesce_tiles(border_cells() if walls is None else walls):
+        platforms.append(platform_pool.acquire(x_offset + col * TILE_SIZE, row * TILE_SIZE, w * TILE_SIZE, h * TILE_SIZE, wall_tile))
     
-    enemy_height = enemy_sprite.get_height() if enemy_sprite else 32
+    if enemy_size is None:
+        enemy_size = enemy_sprite.get_size() if enemy_sprite else (32, 32)
+    enemy_height = enemy_size[1]
     
     possible_enemy_spawns = []
-    for _ in range(12 + (level_num % 5)):
-        x = random.randint(TILE_SIZE * 4, WIDTH - TILE_SIZE * 6)
-        y = random.randint(TILE_SIZE * 4, HEIGHT - TILE_SIZE * 4)
-        x, y = (x // TILE_SIZE) * TILE_SIZE, (y // TILE_SIZE) * TILE_SIZE
-        width = random.choice([64, 96, 128, 160])
-        platforms.append(Platform(x, y, width, 32, platform_tile))
-        possible_enemy_spawns.append((x + width // 2, y - enemy_height))
+    for x, y, width in random_ledges(level_num, rng):
+        platforms.append(platform_pool.acquire(x_offset + x, y, width, 32, platform_tile))
+        possible_enemy_spawns.append((x_offset + x + width // 2, y - enemy_height))
 
     # Douches au lieu des obstacles de feu
     for _ in range(min(level_num // 2, 5)):
-        x = random.randint(TILE_SIZE * 4, WIDTH - TILE_SIZE * 6)
+        x = rng.randint(TILE_SIZE * 4, WIDTH - TILE_SIZE * 6)
         y = HEIGHT - TILE_SIZE * 2 - 64
-        showers.append(Shower(x, y, shower_sprite))
+        showers.append(shower_pool.acquire(x_offset + x, y, shower_sprite))
 
     if possible_enemy_spawns:
-        random.shuffle(possible_enemy_spawns)
-        for i in range(min(10, len(possible_enemy_spawns))):
-            enemy_list.append(Cyclops(possible_enemy_spawns[i][0], possible_enemy_spawns[i][1], enemy_sprite))
+        rng.shuffle(possible_enemy_spawns)
+        if enemy_count <= len(possible_enemy_spawns):
+            enemy_spawns = possible_enemy_spawns[:enemy_count]
+        else:
+            # Niveaux "horde" : plusieurs ennemis partagent chaque corniche
+            enemy_spawns = [possible_enemy_spawns[i % len(possible_enemy_spawns)] for i in range(enemy_count)]
+    enemies = CyclopsSwarm(enemy_spawns, enemy_sprite, enemy_size)
     
-    return platforms, showers, Exit(WIDTH - TILE_SIZE * 2 - 32, HEIGHT // 2 - 64, 64, 128), enemy_list
+    x, y, w, h = EXIT_AREA
+    return platforms, showers, exit_pool.acquire(x_offset + x, y, w, h), enemies
+
+# --- VALIDATION DES NIVEAUX ---
+# La sortie est-elle atteignable ? BFS sur la grille de tuiles, sans simuler de partie : les noeuds sont
+# les cases où le joueur peut se tenir, reliées par la marche, les chutes, l'escalade d'un mur (saut mural)
+# et des sauts pré-calculés une fois avec la physique de Player (simple ou double saut, direction, durée
+# de la poussée). Le modèle est prudent : un saut qui touche un bloc est écarté, et une position x n'est
+# connue qu'à 6 px près (pas de marche), donc un niveau accepté est faisable, pas l'inverse.
+# Lignes de la grille en entiers : bit (colonne + GRID_PAD) à 1 si la case est pleine.
+
+LEVEL_GENERATOR_VERSION = 2 # 2 : graine du niveau tirée de la graine de la partie (corpus en secours)
+GRID_COLS, GRID_ROWS = WIDTH // TILE_SIZE, HEIGHT // TILE_SIZE
+GRID_PAD = 16 # cases pleines ajoutées autour de la grille (bords, sauts qui sortent de l'écran)
+
+_border_rows = None
+
+def level_grid(ledges):
+    """Lignes de bits (cases pleines) du niveau, bords de l'écran compris"""
+    global _border_rows
+    if _border_rows is None:
+        full = (1 << (GRID_COLS + 2 * GRID_PAD)) - 1
+        inside = ((1 << GRID_COLS) - 1) << GRID_PAD
+        _border_rows = [full] * GRID_PAD + [full & ~inside] * GRID_ROWS + [full] * GRID_PAD
+        for col, row in border_cells():
+            if col < GRID_COLS and row < GRID_ROWS:
+                _border_rows[row + GRID_PAD] |= 1 << (col + GRID_PAD)
+    rows = list(_border_rows)
+    for x, y, width in ledges:
+        first, last = x // TILE_SIZE, min((x + width - 1) // TILE_SIZE, GRID_COLS - 1)
+        rows[y // TILE_SIZE + GRID_PAD] |= ((1 << (last - first + 1)) - 1) << (first + GRID_PAD)
+    return rows
+
+def exit_grid():
+    x, y, w, h = EXIT_AREA
+    rows = [0] * (GRID_ROWS + 2 * GRID_PAD)
+    for row in range(y // TILE_SIZE, (y + h - 1) // TILE_SIZE + 1):
+        for col in range(x // TILE_SIZE, (x + w - 1) // TILE_SIZE + 1):
+            rows[row + GRID_PAD] |= 1 << (col + GRID_PAD)
+    return rows
+
+def _cell_masks(cells):
+    """{(colonne, ligne)} relatifs -> [(ligne + GRID_PAD, colonne min + GRID_PAD, masque de colonnes)]"""
+    by_row = {}
+    for dc, dr in cells:
+        by_row.setdefault(dr, []).append(dc)
+    masks = []
+    for dr, dcs in sorted(by_row.items()):
+        low = min(dcs)
+        masks.append((dr + GRID_PAD, low + GRID_PAD, sum(1 << (dc - low) for dc in set(dcs))))
+    return masks
+
+def _rect_cells(rect):
+    return {(cx, cy) for cy in range(rect.top // TILE_SIZE, (rect.bottom - 1) // TILE_SIZE + 1)
+                     for cx in range(rect.left // TILE_SIZE, (rect.right - 1) // TILE_SIZE + 1)}
+
+_jump_templates = None
+
+def jump_templates():
+    """Sauts depuis le sol, simulés une fois avec Player dans un niveau vide, jusqu'au sommet du dernier saut.
+    Le joueur part d'une case alignée à 0, 2 ou 4 px près ; chaque saut garde :
+    (cases balayées par au moins une variante, cases balayées par toutes, décalage x (px), décalage y (px) au sommet)."""
+    global _jump_templates
+    if _jump_templates is not None:
+        return _jump_templates
+    programs = [(0, t2, 0, 0) for t2 in (None, 4, 8, 12, 16, 20, 23)]
+    for d in (-1, 1):
+        for t2 in (None, 4, 8, 12, 16, 20, 23):
+            for h0, h1 in [(0, n) for n in (3, 6, 11, 16, 22)] + [(h, 999) for h in (0, 8, 16, 24, 32)]:
+                programs.append((d, t2, h0, h1))
+
+    origin = (WIDTH // 2 // TILE_SIZE * TILE_SIZE, HEIGHT - TILE_SIZE)
+    templates, seen = [], set()
+    for d, t2, h0, h1 in programs:
+        swept_any, swept_all, end = set(), None, None
+        for ox in (0, 2, 4):
+            player = Player(origin[0] + ox, origin[1], None, PLAYER_SIZE)
+            empty = PlatformGrid([])
+            player.jump()
+            swept = set()
+            for frame in range(200):
+                if frame == t2:
+                    player.jump()
+                player.x_vel = d * PLAYER_VEL if h0 <= frame < h1 else 0
+                player.update(empty)
+                swept |= _rect_cells(player.rect)
+                if player.y_vel >= 0 and (t2 is None or frame >= t2):
+                    break
+            swept = {(cx - origin[0] // TILE_SIZE, cy - origin[1] // TILE_SIZE) for cx, cy in swept}
+            swept_any |= swept
+            swept_all = swept if swept_all is None else swept_all & swept
+            if ox == 0:
+                end = (player.rect.x - origin[0], player.rect.y - origin[1])
+        key = (frozenset(swept_any), end)
+        if key not in seen:
+            seen.add(key)
+            templates.append((_cell_masks(swept_any), _cell_masks(swept_all), end[0], end[1]))
+    _jump_templates = templates
+    return templates
+
+def _blocked(rows, masks, col, row):
+    for dr, dc, mask in masks:
+        if (rows[row + dr] >> (col + dc)) & mask:
+            return True
+    return False
+
+def _fall(solid, goal, x0, x1, y):
+    """Chute verticale d'un joueur dont x est dans [x0, x1] (px) et le haut en y.
+    Retourne 'exit', la case d'arrivée (colonne, ligne), ou None si l'arrivée dépend du x exact."""
+    some_mask = all_mask = 0
+    for col in range(x0 // TILE_SIZE, (x1 + TILE_SIZE - 1) // TILE_SIZE + 1):
+        bit = 1 << (col + GRID_PAD)
+        some_mask |= bit
+        if col * TILE_SIZE <= x0 + TILE_SIZE - 1 and col * TILE_SIZE + TILE_SIZE - 1 >= x1:
+            all_mask |= bit
+    for row in range(y // TILE_SIZE, (y + TILE_SIZE - 1) // TILE_SIZE + 1):
+        if solid[row + GRID_PAD] & some_mask:
+            return None
+        if goal[row + GRID_PAD] & all_mask:
+            return 'exit'
+    row = (y + TILE_SIZE - 1) // TILE_SIZE
+    while True:
+        below = solid[row + 1 + GRID_PAD]
+        if below & all_mask:
+            return (((below & all_mask) & -(below & all_mask)).bit_length() - 1 - GRID_PAD, row)
+        if below & some_mask:
+            return None
+        row += 1
+        if goal[row + GRID_PAD] & all_mask:
+            return 'exit'
+
+def _is_solid(rows, col, row):
+    return (rows[row + GRID_PAD] >> (col + GRID_PAD)) & 1
+
+def _ground_moves(solid, goal, col, row):
+    """Déplacements sans saut depuis (col, row) : marche, chutes, escalade de mur.
+    Retourne la liste des arrivées, ou True si l'un d'eux touche la sortie."""
+    moves = []
+    # Marche, ou chute dès que plus rien ne porte le joueur
+    for step in (-1, 1):
+        nxt = col + step
+        if _is_solid(solid, nxt, row):
+            continue
+        if _is_solid(solid, nxt, row + 1):
+            moves.append((nxt, row))
+        else:
+            x = nxt * TILE_SIZE if step == 1 else nxt * TILE_SIZE - 4
+            moves.append(_fall(solid, goal, x, x + 4, row * TILE_SIZE))
+    # Escalade d'un mur par sauts muraux (joueur plaqué contre le mur, donc aligné),
+    # puis dernier saut mural et passage sur le haut du mur
+    for wall in (-1, 1):
+        if not _is_solid(solid, col + wall, row):
+            continue
+        top = row
+        while _is_solid(solid, col + wall, top - 1) and not _is_solid(solid, col, top - 1):
+            top -= 1
+        if any(_is_solid(solid, col, r) for r in range(top - 3, top)):
+            continue
+        if any(goal[r + GRID_PAD] >> (col + GRID_PAD) & 1 for r in range(top - 3, row + 1)):
+            return True
+        if not any(_is_solid(solid, col + wall, r) for r in range(top - 3, top)):
+            moves.append((col + wall, top - 1))
+    return moves
+
+def _jump_moves(solid, goal, col, row, templates):
+    moves = []
+    x, y = col * TILE_SIZE, row * TILE_SIZE
+    for swept_any, swept_all, dx, dy in templates:
+        if _blocked(solid, swept_any, col, row):
+            continue
+        if _blocked(goal, swept_all, col, row):
+            return True
+        moves.append(_fall(solid, goal, x + dx, x + dx + 4, y + dy))
+    return moves
+
+def _start_cell(solid, goal):
+    """Case où le joueur se pose après son apparition. S'il apparaît dans une corniche,
+    la première frame le replace sur le dessus de celle-ci."""
+    x, y = PLAYER_START
+    span = range(x // TILE_SIZE, (x + TILE_SIZE - 1) // TILE_SIZE + 1)
+    overlap = [row for row in range(y // TILE_SIZE, (y + TILE_SIZE - 1) // TILE_SIZE + 1)
+               if any(_is_solid(solid, col, row) for col in span)]
+    if overlap:
+        if len(overlap) > 1 or any(_is_solid(solid, col, overlap[0] - 1) for col in span):
+            return None
+        y = (overlap[0] - 1) * TILE_SIZE
+    return _fall(solid, goal, x, x, y)
+
+def exit_reachable(solid, goal=None):
+    """Vrai si le joueur peut atteindre la sortie depuis son point de départ (voir le modèle ci-dessus).
+    Les déplacements au sol sont explorés en premier : les sauts, bien plus coûteux à tester,
+    ne sont essayés que lorsque la marche et l'escalade ne trouvent plus de nouvelle case."""
+    goal = goal or exit_grid()
+    start = _start_cell(solid, goal)
+    if start in (None, 'exit'):
+        return start == 'exit'
+    templates = None
+    seen, ground, jumps = {start}, [start], [start]
+    while ground or jumps:
+        if ground:
+            moves = _ground_moves(solid, goal, *ground.pop())
+        else:
+            templates = templates or jump_templates()
+            moves = _jump_moves(solid, goal, *jumps.pop(), templates)
+        if moves is True:
+            return True
+        for move in moves:
+            if move == 'exit' or (move and goal[move[1] + GRID_PAD] >> (move[0] + GRID_PAD) & 1):
+                return True
+            if move and move not in seen:
+                seen.add(move)
+                ground.append(move)
+                jumps.append(move)
+    return False
+
+def level_seed_solvable(level_num, seed):
+    return exit_reachable(level_grid(random_ledges(level_num, random.Random(seed))))
+
+def validate_level_seeds(level_num, seeds):
+    """Vérification par lot : graines de `seeds` dont le niveau a une sortie atteignable"""
+    goal = exit_grid()
+    return [seed for seed in seeds
+            if exit_reachable(level_grid(random_ledges(level_num, random.Random(seed))), goal)]
+
+LEVEL_SEEDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".asset_cache", "level_seeds.json")
+
+class LevelSeedCorpus:
+    """Graines validées par numéro de niveau : les `size` premières graines candidates (0, 1, 2...)
+    dont la sortie est atteignable. Calculées une fois, puis relues depuis le cache disque, qui est
+    invalidé si le générateur ou la physique du joueur changent.
+    pick() garde la disposition propre à la graine de la partie quand elle est valide : le corpus ne sert
+    qu'en secours, et le nombre de niveaux différents n'est pas limité à `size`."""
+    def __init__(self, path=LEVEL_SEEDS_PATH, size=256):
+        self.path = path
+        self.size = size
+        self.lock = threading.Lock() # appelé depuis le thread du LevelPipeline
+        self.levels = None
+
+    def key(self):
+        return [LEVEL_GENERATOR_VERSION, self.size, PLAYER_VEL, Player.GRAVITY, Player.JUMP_STRENGTH,
+                Player.MAX_FALL_SPEED, list(PLAYER_SIZE), TILE_SIZE]
+
+    def _load(self):
+        self.levels = {}
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('key') == self.key():
+            self.levels = {int(level): seeds for level, seeds in data['levels'].items()}
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + ".tmp", "w") as f:
+                json.dump({'key': self.key(), 'levels': self.levels}, f)
+            os.replace(self.path + ".tmp", self.path)
+        except OSError as e:
+            print(f"! Impossible d'écrire le cache des niveaux : {e}")
+
+    def seeds(self, level_num):
+        with self.lock:
+            if self.levels is None:
+                self._load()
+            if level_num not in self.levels:
+                seeds, start = [], 0
+                while len(seeds) < self.size:
+                    seeds += validate_level_seeds(level_num, range(start, start + self.size))
+                    start += self.size
+                self.levels[level_num] = seeds[:self.size]
+                self._save()
+            return self.levels[level_num]
+
+    def pick(self, level_num, key):
+        """Graine validée pour le niveau, tirée de key (graine de la partie) : celle du niveau dans la partie
+        si sa sortie est atteignable (environ 0,3 ms de vérification), sinon une graine du corpus"""
+        # Mélange avec le numéro du niveau : sinon tous les niveaux de la partie partageraient leurs corniches
+        candidate = (key * 1000003 + level_num) % (1 << 64)
+        if level_seed_solvable(level_num, candidate):
+            return candidate
+        seeds = self.seeds(level_num)
+        return seeds[key % len(seeds)]
+
+level_seed_corpus = LevelSeedCorpus()
+
+def bake_level_surface(background, platforms, offset=(0, 0)):
+    """Pré-rend le fond du biome et toutes les plateformes du niveau sur une seule surface.
+    A refaire uniquement quand le niveau (ou le biome) change."""
+    level_surface = background.copy()
+    for p in platforms: p.draw(level_surface, offset)
+    return level_surface
+
+def compose_end_screen(image, title, title_color, font, big_font):
+    """Compose une seule fois l'écran de fin : image plein écran (ou fond noir), titre et consigne"""
+    if image:
+        overlay = pygame.transform.scale(image, (WIDTH, HEIGHT))
+    else:
+        overlay = pygame.Surface((WIDTH, HEIGHT))
+        overlay.fill(BLACK)
+    overlay.blit(big_font.render(title, True, title_color), (WIDTH // 2 - 150, HEIGHT // 2 - 50))
+    overlay.blit(font.render("Press R to restart", True, WHITE), (WIDTH // 2 - 250, HEIGHT // 2 + 20))
+    return overlay
+
+class GameplayRenderer:
+    """Rendu du jeu par zones modifiées, sur le fond pré-rendu du niveau.
+    Les sprites sont parcourus par calques (douches, sortie, joueur, ennemis, HUD). Seuls ceux dont la
+    position ou l'apparence a changé sont effacés (fond restauré dessous) puis redessinés, avec les
+    sprites qu'ils recouvrent. draw() retourne les rects à présenter avec pygame.display.update.
+    Niveau long : le fond de la vue est recomposé depuis les chunks visibles quand la caméra bouge,
+    et les sprites hors de la vue ne sont pas parcourus."""
+    MAX_SPRITES = 200 # au-delà (niveaux "horde"), un rendu complet coûte moins cher
+
+    def __init__(self, background):
+        self.background = background
+        self.shown = {}
+        self.full = True
+        self.view_surface = None
+        self.view_key = None
+
+    def set_background(self, background):
+        self.background = background
+        self.view_key = None
+        self.invalidate()
+
+    def invalidate(self):
+        """Force un rendu complet à la prochaine frame (nouveau niveau, écran recouvert...)"""
+        self.full = True
+
+    def compose_view(self, world, view):
+        """Fond de la vue à partir des surfaces des chunks visibles, recomposé seulement si la vue change"""
+        key = (view.x, tuple(sorted(world.chunks)))
+        if key != self.view_key:
+            if self.view_surface is None:
+                self.view_surface = pygame.Surface((WIDTH, HEIGHT)).convert()
+            self.view_surface.fill(BLACK)
+            self.view_surface.blits(((surface, (x, 0)) for x, surface in world.surfaces(view)), False)
+            self.view_key = key
+            self.background = self.view_surface
+            self.invalidate()
+
+    def layers(self, game, hud, camera_x=None, alpha=1.0):
+        """Sprites de la frame, du calque du fond vers l'avant : (clé, rect, état, fonction de dessin).
+        Les rects sont en coordonnées écran (décalés de la caméra) ; les sprites hors écran sont ignorés.
+        alpha < 1 : joueur et ennemis dessinés entre leur position du pas précédent et l'actuelle."""
+        offset = (-(game.camera.x if camera_x is None else camera_x), 0)
+        previous = game.previous if alpha < 1 else None
+        screen = WORLD_RECT
+        for s in game.showers:
+            rect = s.rect.move(offset)
+            if rect.colliderect(screen):
+                yield (('shower', id(s)), rect, 0 if s.sprite_image else s.animation_frame // 10,
+                       lambda surface, s=s: s.draw(surface, offset))
+        door = game.exit_door
+        rect = door.rect.move(offset)
+        if rect.colliderect(screen):
+            yield 'exit', rect, door.animation_frame, lambda surface: door.draw(surface, offset)
+        player = game.player
+        player_offset = offset
+        if previous:
+            # Position interpolée = actuelle + (précédente - actuelle) * (1 - alpha)
+            (x, y), rest = previous[0], 1 - alpha
+            player_offset = (offset[0] + round((x - player.rect.x) * rest), round((y - player.rect.y) * rest))
+        yield 'player', player.rect.move(player_offset), player.direction, lambda surface: player.draw(surface, player_offset)
+        enemies = game.enemies
+        shift = None
+        if previous and previous[1] is not None and len(previous[1]) == len(enemies):
+            shift = np.rint((previous[1] - enemies.pos) * (1 - alpha)).astype(int)
+        for i, rect in enumerate(enemies.rects()):
+            enemy_offset = offset if shift is None else (offset[0] + int(shift[i, 0]), int(shift[i, 1]))
+            rect.move_ip(enemy_offset)
+            if rect.colliderect(screen):
+                yield (('enemy', i), rect, int(enemies.direction[i]),
+                       lambda surface, i=i, o=enemy_offset: enemies.draw_one(surface, i, o))
+        for key, image, pos, state in hud:
+            yield key, image.get_rect(topleft=pos), state, lambda surface, image=image, pos=pos: surface.blit(image, pos)
+
+    def draw(self, surface, game, hud=(), alpha=1.0):
+        """hud : éléments (clé, image, position, état) dessinés au-dessus du jeu.
+        alpha : fraction du pas de simulation écoulée depuis le dernier step (interpolation)"""
+        camera_x = game.camera.x
+        if alpha < 1 and game.previous:
+            camera_x = round(game.previous[2] + (camera_x - game.previous[2]) * alpha)
+        if game.world:
+            self.compose_view(game.world, pygame.Rect(camera_x, 0, WIDTH, HEIGHT))
+        sprites = list(self.layers(game, hud, camera_x, alpha))
+        shown = {key: (rect, state) for key, rect, state, _ in sprites}
+        if self.full or len(sprites) > self.MAX_SPRITES:
+            surface.blit(self.background, (0, 0))
+            for _, _, _, draw in sprites: draw(surface)
+            self.shown = shown
+            self.full = False
+            return [surface.get_rect()]
+        
+        dirty = []
+        for key, (rect, state) in shown.items():
+            previous = self.shown.pop(key, None)
+            if previous != (rect, state):
+                dirty.append(rect)
+                if previous: dirty.append(previous[0])
+        # Sprites disparus (douche ramassée, coeur perdu)
+        dirty.extend(rect for rect, _ in self.shown.values())
+        self.shown = shown
+        
+        for area in dirty:
+            surface.set_clip(area)
+            surface.blit(self.background, area, area)
+            for _, rect, _, draw in sprites:
+                if rect.colliderect(area): draw(surface)
+        surface.set_clip(None)
+        return dirty
 
 def reset_player(player):
-    player.rect.topleft = (100, HEIGHT - 200)
+    player.rect.topleft = PLAYER_START
     player.x_vel, player.y_vel = 0, 0
 
+# --- NAVIGATION DES ENNEMIS ---
+
+def solid_grid(platforms, origin_x, cols):
+    """Cases pleines (lignes, colonnes) de la bande du monde qui commence en origin_x"""
+    solid = np.zeros((GRID_ROWS, cols), dtype=bool)
+    for p in platforms:
+        r = p.rect.move(-origin_x, 0)
+        left, right = max(0, r.left // TILE_SIZE), min(cols, (r.right - 1) // TILE_SIZE + 1)
+        top, bottom = max(0, r.top // TILE_SIZE), min(GRID_ROWS, (r.bottom - 1) // TILE_SIZE + 1)
+        if left < right and top < bottom:
+            solid[top:bottom, left:right] = True
+    return solid
+
+def enemy_footprint(width, height):
+    """Cases (largeur, hauteur) couvertes par un ennemi de cette taille aligné sur la grille"""
+    return -(-width // TILE_SIZE), -(-height // TILE_SIZE)
+
+def flow_fields(solid, swarms, origin_x=0):
+    """Un FlowField par taille d'ennemi présente dans swarms : footprint -> FlowField"""
+    footprints = {enemy_footprint(s.width, s.height) for s in swarms if len(s)}
+    return {footprint: FlowField(solid, origin_x, footprint) for footprint in footprints}
+
+class FlowField:
+    """Chemins vers le joueur sur la grille des tuiles (parcours en largeur 8-connexe, sans couper les coins),
+    partagés par tous les ennemis d'une même taille. Une case du champ est une position du corps entier
+    (footprint cases, coin haut gauche sur la case) : elle n'est accessible que si toutes ses cases sont libres,
+    si bien qu'un Miro de 2x2 cases ne s'engage pas dans un couloir d'une case.
+    Recalculés seulement quand le joueur change de case : chaque case reçoit le centre du corps sur la case
+    suivante de son chemin, que chaque ennemi lit en O(1) (indexation NumPy groupée). Un ennemi dont le corps
+    ne tient pas sur sa case (dans un mur) va d'abord vers la case libre la plus proche.
+    Les derniers champs calculés sont gardés (le joueur repasse souvent par les mêmes cases)."""
+    OFFSETS = ((-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
+    CACHE_SIZE = 32
+
+    def __init__(self, solid, origin_x=0, footprint=(1, 1)):
+        rows, cols = solid.shape
+        self.origin_x = origin_x
+        self.rows, self.cols = rows, cols
+        self.footprint = width, height = footprint
+        # Positions où le corps tient : toutes les cases couvertes libres (au-delà de la grille : pleines)
+        blocked = np.ones((rows + height - 1, cols + width - 1), dtype=bool)
+        blocked[:rows, :cols] = solid
+        fits = np.ones((rows, cols), dtype=bool)
+        for dy in range(height):
+            for dx in range(width):
+                fits &= ~blocked[dy:dy + rows, dx:dx + cols]
+        # Grille aplatie entourée d'une rangée de cases pleines : pas de test de bord dans le parcours
+        self.stride = cols + 2
+        free = np.zeros((rows + 2, cols + 2), dtype=bool)
+        free[1:-1, 1:-1] = fits
+        free = self.free = free.ravel()
+        self.steps = np.array([dy * self.stride + dx for dx, dy in self.OFFSETS])
+        index = np.arange(self.stride + 1, free.size - self.stride - 1)
+        # passable[k][i] : déplacement possible de i vers i + steps[k]
+        passable = np.zeros((len(self.OFFSETS), free.size), dtype=bool)
+        for k, (dx, dy) in enumerate(self.OFFSETS):
+            ok = free[index] & free[index + self.steps[k]]
+            if dx and dy:
+                ok &= free[index + dx] & free[index + dy * self.stride]
+            passable[k, index] = ok
+        # Voisins accessibles de chaque case, en listes Python pour le parcours
+        self.neighbours = [[] for _ in range(free.size)]
+        for step, mask in zip(self.steps.tolist(), passable):
+            for i in np.flatnonzero(mask).tolist():
+                self.neighbours[i].append(i + step)
+        # Centre (x, y) du corps posé sur chaque case, dans le monde
+        row, col = np.divmod(np.arange(free.size), self.stride)
+        self.centers = np.stack([origin_x + (col - 1) * TILE_SIZE + width * TILE_SIZE / 2,
+                                 (row - 1) * TILE_SIZE + height * TILE_SIZE / 2], axis=1).astype(np.float64)
+        # Cases où le corps ne tient pas : case suivante vers la case libre la plus proche (sans obstacle),
+        # indépendante du joueur et calculée une fois
+        inside = np.zeros(free.size, dtype=bool)
+        inside[index] = True
+        self.stuck = np.flatnonzero(inside & ~free)
+        parent = [-1] * free.size
+        queue = deque(np.flatnonzero(free).tolist())
+        for i in queue: parent[i] = i
+        steps = self.steps.tolist()
+        while queue:
+            i = queue.popleft()
+            for step in steps:
+                j = i + step
+                if parent[j] < 0 and inside[j]:
+                    parent[j] = i
+                    queue.append(j)
+        parent = np.array(parent)[self.stuck]
+        self.escape = np.full((len(self.stuck), 2), np.nan)
+        self.escape[parent >= 0] = self.centers[parent[parent >= 0]]
+        self.aim = None
+        self.target = None
+        self.cache = OrderedDict()
+
+    def cell_index(self, x, y):
+        col = min(max(int(x - self.origin_x) // TILE_SIZE, 0), self.cols - 1)
+        row = min(max(int(y) // TILE_SIZE, 0), self.rows - 1)
+        return (row + 1) * self.stride + col + 1
+
+    def update(self, point):
+        """Recalcule les chemins si point (joueur) a changé de case ; vrai si recalculé"""
+        target = self.cell_index(*point)
+        if target == self.target:
+            return False
+        self.target = target
+        if target in self.cache:
+            self.cache.move_to_end(target)
+            self.aim = self.cache[target]
+            return True
+        # Départs : positions libres du corps qui recouvrent la case du joueur
+        row, col = divmod(target, self.stride)
+        width, height = self.footprint
+        sources = [(row - dy) * self.stride + col - dx for dy in range(height) for dx in range(width)
+                   if row - dy >= 1 and col - dx >= 1 and self.free[(row - dy) * self.stride + col - dx]]
+        # Parcours en largeur : la case par laquelle une case est atteinte est la suivante sur un plus
+        # court chemin vers le joueur
+        parent = [-1] * len(self.neighbours)
+        for i in sources: parent[i] = i
+        queue = deque(sources)
+        neighbours = self.neighbours
+        while queue:
+            i = queue.popleft()
+            for j in neighbours[i]:
+                if parent[j] < 0:
+                    parent[j] = i
+                    queue.append(j)
+        parent = np.array(parent)
+        # Départs : le corps se place sur la case (il touche le joueur) ; NaN : cases libres inaccessibles,
+        # visées en ligne droite
+        aim = np.full((len(parent), 2), np.nan)
+        reached = parent >= 0
+        aim[reached] = self.centers[parent[reached]]
+        aim[self.stuck] = self.escape
+        self.aim = self.cache[target] = aim
+        if len(self.cache) > self.CACHE_SIZE:
+            self.cache.popitem(last=False)
+        return True
+
+    def waypoints(self, points, target):
+        """Point à viser pour chaque centre d'ennemi (tableau n x 2) : centre du corps sur la case suivante
+        vers le joueur, ou target hors du champ. La case d'un ennemi est la position alignée la plus proche
+        de son corps ; un corps décalé de plus d'un quart de case s'y réaligne d'abord, sans quoi il
+        mordrait sur les tuiles voisines en suivant le chemin."""
+        width, height = self.footprint
+        cols = np.floor((points[:, 0] - self.origin_x) / TILE_SIZE - (width - 1) / 2)
+        rows = np.floor(points[:, 1] / TILE_SIZE - (height - 1) / 2)
+        cols = np.minimum(np.maximum(cols, 0), self.cols - 1)
+        rows = np.minimum(np.maximum(rows, 0), self.rows - 1)
+        cells = (rows.astype(np.int64) + 1) * self.stride + cols.astype(np.int64) + 1
+        aim = self.aim[cells]
+        own = self.centers[cells]
+        realign = self.free[cells] & (np.abs(points - own).max(axis=1) > TILE_SIZE / 4)
+        aim[realign] = own[realign]
+        direct = np.isnan(aim[:, 0])
+        aim[direct] = target
+        return aim
+
+# --- SIMULATION ---
+
+class BuiltLevel:
+    """Niveau prêt à jouer : géométrie, collisions pré-calculées, apparitions et rendu des plateformes.
+    solid : cases pleines de l'écran qui commence en origin_x ; flows : FlowField par taille d'ennemi
+    d'un niveau d'un seul écran (les chunks d'un niveau long n'en ont pas, voir ChunkedLevel)"""
+    def __init__(self, platforms, showers, exit_door, enemies, surface=None, origin_x=0):
+        self.platforms = platforms
+        self.showers = showers
+        self.exit_door = exit_door
+        self.enemies = enemies
+        self.platform_grid = PlatformGrid(platforms)
+        self.surface = surface
+        self.solid = solid_grid(platforms, origin_x, GRID_COLS)
+        self.flows = {}
+
+    def release(self):
+        """Rend plateformes, douches restantes et sortie aux pools (le niveau ne doit plus servir)"""
+        platform_pool.release(self.platforms)
+        shower_pool.release(self.showers)
+        exit_pool.release((self.exit_door,))
+        self.platforms, self.showers, self.exit_door = [], [], None
+
+class LevelPipeline:
+    """Construit les niveaux à l'avance sur un thread de fond : à la sortie (ou après R) le niveau
+    est déjà prêt et n'est plus que récupéré. Sans thread (background=False), take() construit sur place."""
+    def __init__(self, build, background=True, executor=None):
+        self.build = build
+        # Un exécuteur fourni (celui du pipeline des niveaux) est partagé, et n'est pas arrêté par shutdown()
+        self.owns_executor = executor is None
+        self.executor = executor or (ThreadPoolExecutor(max_workers=1, thread_name_prefix="level-build") if background else None)
+        self.pending = {}
+
+    def prefetch(self, key):
+        if self.executor and key not in self.pending:
+            self.pending[key] = self.executor.submit(self.build, *key)
+
+    def take(self, key):
+        """Niveau de la clé : attend la construction en cours, ou construit si rien n'a été lancé"""
+        future = self.pending.pop(key, None)
+        return future.result() if future else self.build(*key)
+
+    def retain(self, keep):
+        """Abandonne les niveaux dont la clé ne sera plus demandée"""
+        for key in [k for k in self.pending if not keep(k)]:
+            self.pending.pop(key).cancel()
+
+    def shutdown(self):
+        if self.executor and self.owns_executor:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+        self.executor = None
+        self.pending.clear()
+
+# --- NIVEAUX LONGS : CAMERA ET CHUNKS ---
+# Un niveau long est une suite d'écrans (chunks) de CHUNK_WIDTH, chacun généré depuis une graine validée.
+# Seuls les chunks autour de la vue sont construits, rendus et gardés en mémoire.
+
+CHUNK_WIDTH = WIDTH
+
+def chunk_cells(index, count):
+    """Bords d'un chunk : sol et plafond partout, mur de gauche au premier, mur de droite (et sortie) au dernier"""
+    edges = (0, 1, GRID_ROWS - 2, GRID_ROWS - 1)
+    return {(col, row) for col, row in border_cells()
+            if col < GRID_COLS and row < GRID_ROWS and (row in edges or (col < 2 and index == 0)
+                                                        or (col >= GRID_COLS - 2 and index == count - 1))}
+
+class Camera:
+    """Vue horizontale dans un monde plus large que l'écran, centrée sur le joueur"""
+    def __init__(self, world_width, view_width=WIDTH):
+        self.world_width = world_width
+        self.view_width = view_width
+        self.x = 0
+
+    def follow(self, rect):
+        self.x = max(0, min(rect.centerx - self.view_width // 2, self.world_width - self.view_width))
+
+    @property
+    def view(self):
+        return pygame.Rect(self.x, 0, self.view_width, HEIGHT)
+
+class SwarmGroup:
+    """Ennemis des chunks chargés, présentés comme un seul CyclopsSwarm"""
+    def __init__(self, swarms):
+        self.swarms = [s for s in swarms if len(s)]
+
+    def __len__(self): return sum(len(s) for s in self.swarms)
+
+    def update(self, player_rect, flows=None):
+        for s in self.swarms: s.update(player_rect, flows)
+
+    def collides(self, rect):
+        return any(s.collides(rect) for s in self.swarms)
+
+    def reset_positions(self):
+        for s in self.swarms: s.reset_positions()
+
+    def rects(self):
+        return [rect for s in self.swarms for rect in s.rects()]
+
+    @property
+    def pos(self):
+        return np.concatenate([s.pos for s in self.swarms]) if self.swarms else np.zeros((0, 2))
+
+    @property
+    def direction(self):
+        return np.concatenate([s.direction for s in self.swarms]) if self.swarms else np.zeros(0, dtype=np.int8)
+
+    def draw_one(self, surface, index, offset=(0, 0)):
+        for s in self.swarms:
+            if index < len(s):
+                return s.draw_one(surface, index, offset)
+            index -= len(s)
+
+class ChunkedLevel:
+    """Niveau de plusieurs écrans. stream() garde chargés les chunks visibles et leurs voisins
+    (MARGIN de chaque côté) et libère les autres ; les suivants sont construits en avance sur le
+    thread du pipeline. Collisions (query) et rendu ne voient que les chunks chargés : la mémoire
+    et le coût par frame ne dépendent pas de la longueur du niveau.
+    flows : FlowField par taille d'ennemi sur la bande des chunks chargés. Ceux des fenêtres que la caméra
+    peut atteindre ensuite sont construits en avance sur le thread du pipeline, derrière les chunks dont ils
+    ont besoin."""
+    MARGIN = 1
+
+    def __init__(self, build_chunk, count, executor=None, exit_rect=None):
+        self.count = count
+        self.bounds = pygame.Rect(0, 0, count * CHUNK_WIDTH, HEIGHT)
+        self.pipeline = LevelPipeline(build_chunk, executor is not None, executor)
+        self.chunks = {}
+        # Douches ramassées : (chunk, position), retirées si le chunk est reconstruit
+        self.collected = set()
+        if exit_rect is None:
+            x, y, w, h = EXIT_AREA
+            exit_rect = ((count - 1) * CHUNK_WIDTH + x, y, w, h)
+        self.exit_door = exit_pool.acquire(*exit_rect)
+        # Fenêtre de chunks (range) -> FlowField par taille d'ennemi, en construction
+        self.pending_flows = {}
+        self.flows = {}
+        # Fenêtre où la caméra revient quand le joueur est touché (retour au départ)
+        respawn = Camera(self.bounds.width)
+        respawn.follow(pygame.Rect(PLAYER_START, PLAYER_SIZE))
+        self.respawn_window = self._window(respawn.view, self.MARGIN)
+
+    def _window(self, view, margin):
+        first = max(0, view.left // CHUNK_WIDTH - margin)
+        last = min(self.count - 1, (view.right - 1) // CHUNK_WIDTH + margin)
+        return range(first, last + 1)
+
+    def stream(self, view, prefetch=True):
+        """Charge et libère les chunks autour de view ; vrai si l'ensemble chargé a changé"""
+        wanted = self._window(view, self.MARGIN)
+        changed = False
+        for index in [i for i in self.chunks if i not in wanted]:
+            self.chunks.pop(index).release()
+            changed = True
+        for index in wanted:
+            if index not in self.chunks:
+                chunk = self.pipeline.take((index,))
+                chunk.showers = [s for s in chunk.showers if (index, s.rect.topleft) not in self.collected]
+                self.chunks[index] = chunk
+                changed = True
+        if changed:
+            self.flows = self._take_flows(wanted)
+        if prefetch:
+            ahead = self._window(view, self.MARGIN + 1)
+            self.pipeline.retain(lambda key: key[0] in ahead)
+            for index in ahead:
+                if index not in self.chunks:
+                    self.pipeline.prefetch((index,))
+            self._prefetch_flows(view)
+        return changed
+
+    @staticmethod
+    def _build_flows(window, sources):
+        """sources : chunks de la fenêtre, ou leurs constructions (Future) soumises avant sur le même thread,
+        donc déjà terminées"""
+        chunks = [s.result() if isinstance(s, Future) else s for s in sources]
+        return flow_fields(np.hstack([c.solid for c in chunks]), [c.enemies for c in chunks], window.start * CHUNK_WIDTH)
+
+    def _take_flows(self, window):
+        """Champs de la fenêtre chargée : préparés en avance si prévu, sinon construits ici"""
+        future = self.pending_flows.pop(window, None)
+        if future is not None:
+            try:
+                return future.result()
+            except CancelledError:
+                pass
+        return self._build_flows(window, [self.chunks[index] for index in window])
+
+    def _prefetch_flows(self, view):
+        """Lance la construction des champs des fenêtres voisines : celles de la caméra décalée d'un pixel
+        ou arrêtée sur le bord de chunk précédent ou suivant (la caméra avance de moins d'un chunk par pas),
+        et celle du retour au départ"""
+        executor = self.pipeline.executor
+        if executor is None:
+            return
+        below = view.left // CHUNK_WIDTH * CHUNK_WIDTH
+        above = below + CHUNK_WIDTH
+        current = self._window(view, self.MARGIN)
+        windows = {self._window(view.move(x - view.left, 0), self.MARGIN)
+                   for x in (view.left - 1, view.left + 1, below - 1, below, above, above + 1)}
+        windows.add(self.respawn_window)
+        windows = {w for w in windows if len(w) and w != current}
+        for window in [w for w in self.pending_flows if w not in windows]:
+            self.pending_flows.pop(window).cancel()
+        for window in windows:
+            if window in self.pending_flows:
+                continue
+            sources = [self.chunks.get(index) or self.pipeline.pending.get((index,)) for index in window]
+            if all(sources):
+                self.pending_flows[window] = executor.submit(self._build_flows, window, sources)
+
+    def collect(self, shower):
+        index = shower.rect.x // CHUNK_WIDTH
+        self.collected.add((index, shower.rect.topleft))
+        chunk = self.chunks.get(index)
+        if chunk and shower in chunk.showers:
+            chunk.showers.remove(shower)
+
+    def query(self, rect):
+        found = []
+        for index in range(max(0, rect.left // CHUNK_WIDTH), min(self.count - 1, (rect.right - 1) // CHUNK_WIDTH) + 1):
+            chunk = self.chunks.get(index)
+            if chunk:
+                found.extend(chunk.platform_grid.query(rect))
+        return found
+
+    def __iter__(self):
+        for index in sorted(self.chunks):
+            yield from self.chunks[index].platforms
+
+    def __len__(self): return sum(len(c.platforms) for c in self.chunks.values())
+
+    def showers(self):
+        return [s for index in sorted(self.chunks) for s in self.chunks[index].showers]
+
+    def enemies(self):
+        return SwarmGroup([self.chunks[index].enemies for index in sorted(self.chunks)])
+
+    def surfaces(self, view):
+        """(x écran, surface) des chunks chargés et rendus qui recouvrent view"""
+        return [(index * CHUNK_WIDTH - view.x, self.chunks[index].surface) for index in self._window(view, 0)
+                if index in self.chunks and self.chunks[index].surface]
+
+    def release(self):
+        """Arrête les constructions en cours et rend les entités des chunks chargés aux pools"""
+        self.pipeline.shutdown()
+        self.pending_flows.clear()
+        for chunk in self.chunks.values(): chunk.release()
+        self.chunks.clear()
+        exit_pool.release((self.exit_door,))
+        self.exit_door = None
+
+class Game:
+    """Logique de jeu (état PLAYING) : niveaux, biomes, joueur, ennemis, douches et sortie.
+    N'utilise ni fenêtre ni son : sans sprites (mode headless) seules les hitbox existent,
+    et step() peut être appelé aussi vite que le CPU le permet.
+    Chaque niveau est tiré du corpus de graines validées (sortie atteignable) selon la graine de la partie :
+    le niveau suivant et le premier niveau de la partie suivante sont construits en avance par un LevelPipeline. bake(biome, platforms, offset),
+    si fourni, pré-rend aussi le fond du niveau sur le même thread.
+    level_length > 1 : niveaux longs de plusieurs écrans (ChunkedLevel), suivis par une caméra.
+    pack : ContentPack dont sont lus niveaux, biomes et dialogues à la place de la campagne procédurale
+    (graine, enemy_count et level_length n'ont alors plus d'effet sur les niveaux)."""
+    MAX_LEVELS = sum(biome['levels'] for biome in BIOMES) # niveaux de la campagne procédurale
+
+    def __init__(self, sprites=None, tiles=None, seed=None, enemy_count=10, prebuild=True, bake=None, level_seeds=None,
+                 level_length=1, pack=None):
+        self.sprites = sprites or {}
+        self.pack = pack
+        self.biomes = pack.biomes if pack else BIOMES
+        # Premier niveau de chaque biome, puis celui qui suivrait le dernier
+        self.biome_first = [1]
+        for biome in self.biomes: self.biome_first.append(self.biome_first[-1] + biome['levels'])
+        self.max_levels = self.biome_first[-1] - 1
+        self.tiles = tiles
+        self.enemy_count = enemy_count
+        self.level_length = level_length
+        self.world = None
+        self.built = None
+        # (position du joueur, positions des ennemis, caméra) avant le dernier step, pour l'interpolation
+        # du rendu ; None après une téléportation (niveau, coup, restart) : rien à interpoler
+        self.previous = None
+        self.bake = bake
+        self.level_seeds = level_seeds or level_seed_corpus
+        # Graine tirée si absente : conservée pour pouvoir enregistrer la partie (voir Replay, sur 64 bits)
+        self.seed = random.getrandbits(63) if seed is None else seed % (1 << 64)
+        self.rng = random.Random(self.seed)
+        self.levels = LevelPipeline(self.build_level, prebuild)
+        self.next_run_seed = self.rng.getrandbits(64)
+        self.player = Player(*PLAYER_START, self.sprites.get('player'), PLAYER_SIZE)
+        self.restart()
+
+    def restart(self):
+        self.level = 1
+        self.biome = 1
+        self.frame = 0
+        self.game_over = False
+        self.victory = False
+        self.player.lives = MAX_LIVES
+        reset_player(self.player)
+        self.run_seed, self.next_run_seed = self.next_run_seed, self.rng.getrandbits(64)
+        self.levels.retain(lambda key: key[0] == self.run_seed)
+        self.load_level()
+
+    def biome_of(self, level):
+        """Biome (à partir de 1) du niveau"""
+        return min(bisect_right(self.biome_first, level), len(self.biomes))
+
+    def dialogue(self, name):
+        """Répliques du dialogue name ([] s'il n'existe pas)"""
+        if self.pack:
+            return self.pack.dialogue(name) if name in self.pack.dialogues else []
+        return DIALOGUES.get(name, [])
+
+    def build_level(self, run_seed, level):
+        """Construit le niveau `level` de la partie `run_seed` (appelé sur le thread de fond)"""
+        if self.pack:
+            return self.build_packed_level(level)
+        if self.level_length == 1:
+            built = self.build_screen(level, run_seed)
+            built.flows = flow_fields(built.solid, [built.enemies])
+            return built
+        world = ChunkedLevel(lambda index: self.build_screen(level, run_seed + index, index, self.level_length),
+                             self.level_length, self.levels.executor)
+        # Premiers chunks construits ici (sans préchargement : on est déjà sur le thread du pipeline)
+        world.stream(Camera(world.bounds.width).view, prefetch=False)
+        return world
+
+    def build_screen(self, level, seed, index=0, count=1):
+        """Un écran du niveau : le niveau entier, ou le chunk `index` sur `count` d'un niveau long"""
+        # Sprite ennemi du biome (Cyclope au biome 1)
+        biome = self.biomes[self.biome_of(level) - 1]
+        rng = random.Random(self.level_seeds.pick(level, seed))
+        x_offset = index * CHUNK_WIDTH
+        built = BuiltLevel(*generate_random_level(level, self.tiles, self.sprites.get(biome['enemy']), self.sprites.get('shower'),
+                                                  biome['enemy_size'], rng, self.enemy_count,
+                                                  chunk_cells(index, count) if count > 1 else None, x_offset),
+                           origin_x=x_offset)
+        if self.bake:
+            built.surface = self.bake(biome, built.platforms, (-x_offset, 0))
+        return built
+
+    def build_packed_level(self, level):
+        """Niveau du pack, décodé ici (sur le thread de fond) : seul le niveau joué et le suivant sont en mémoire"""
+        data = self.pack.level(level)
+        rows, cols = data.tiles.shape
+        if rows != GRID_ROWS or not cols or cols % GRID_COLS:
+            raise ValueError(f"niveau {level} du pack : grille de {cols}x{rows} cases (attendu {GRID_ROWS} lignes "
+                             f"et un multiple de {GRID_COLS} colonnes)")
+        biome = self.biomes[self.biome_of(level) - 1]
+        if cols == GRID_COLS:
+            built = self.build_packed_screen(data, biome)
+            built.flows = flow_fields(built.solid, [built.enemies])
+            return built
+        world = ChunkedLevel(lambda index: self.build_packed_screen(data, biome, index), cols // GRID_COLS,
+                             self.levels.executor, data.exit)
+        world.stream(Camera(world.bounds.width).view, prefetch=False)
+        return world
+
+    def build_packed_screen(self, data, biome, index=0):
+        """Écran `index` d'un niveau du pack : plateformes fusionnées par type de tuile, ennemis et douches de l'écran"""
+        x_offset = index * CHUNK_WIDTH
+        tiles = data.tiles[:, index * GRID_COLS:(index + 1) * GRID_COLS]
+        platforms = []
+        for tile_type, key in ((TILE_WALL, 'wall'), (TILE_BLOCK, 'block')):
+            image = self.tiles.get(key) if self.tiles else None
+            rows, cols = np.nonzero(tiles == tile_type)
+            for col, row, w, h in coalesce_tiles(list(zip(cols.tolist(), rows.tolist()))):
+                platforms.append(platform_pool.acquire(x_offset + col * TILE_SIZE, row * TILE_SIZE,
+                                                       w * TILE_SIZE, h * TILE_SIZE, image))
+        def on_screen(points): return points[(points[:, 0] >= x_offset) & (points[:, 0] < x_offset + CHUNK_WIDTH)].tolist()
+        shower_sprite = self.sprites.get('shower')
+        showers = [shower_pool.acquire(x, y, shower_sprite) for x, y in on_screen(data.showers)]
+        enemies = CyclopsSwarm(on_screen(data.enemies), self.sprites.get(biome['enemy']), biome['enemy_size'])
+        built = BuiltLevel(platforms, showers, exit_pool.acquire(*data.exit), enemies, origin_x=x_offset)
+        if self.bake:
+            built.surface = self.bake(biome, built.platforms, (-x_offset, 0))
+        return built
+
+    def load_level(self):
+        with profiler.scope("level.load"):
+            built = self.levels.take((self.run_seed, self.level))
+        # Entités du niveau précédent recyclées pour les prochains niveaux
+        if self.built:
+            self.built.release()
+        self.built = built
+        if isinstance(built, ChunkedLevel):
+            self.world = built
+            self.exit_door = built.exit_door
+            self.level_surface = None
+            self._refresh_world()
+        else:
+            self.world = None
+            self.platforms, self.showers, self.exit_door, self.enemies = built.platforms, built.showers, built.exit_door, built.enemies
+            self.platform_grid = built.platform_grid
+            self.level_surface = built.surface
+            self.flows = built.flows
+        self.camera = Camera(self.platform_grid.bounds.width)
+        self.camera.follow(self.player.rect)
+        # Niveau suivant et premier niveau de la prochaine partie construits pendant que celui-ci se joue
+        if self.level < self.max_levels:
+            self.levels.prefetch((self.run_seed, self.level + 1))
+        self.levels.prefetch((self.next_run_seed, 1))
+
+    def _refresh_world(self):
+        """Plateformes, douches et ennemis des chunks chargés du niveau long"""
+        world = self.world
+        self.platform_grid = world
+        self.platforms = list(world)
+        self.showers = world.showers()
+        self.enemies = world.enemies()
+        self.flows = world.flows
+
+    @property
+    def finished(self):
+        return self.game_over or self.victory
+
+    def step(self, inputs):
+        """Avance la simulation d'une frame. inputs : combinaison de bits INPUT_*.
+        Retourne l'ensemble des événements de la frame
+        ('restart', 'shower', 'hit', 'game_over', 'level', 'biome', 'victory')."""
+        events = set()
+        player = self.player
+        self.previous = (player.rect.topleft, self.enemies.pos.copy(), self.camera.x)
+        if self.finished:
+            if not inputs & INPUT_RESTART:
+                return events
+            self.restart()
+            events.add('restart')
+        elif inputs & INPUT_JUMP:
+            player.jump()
+        self.frame += 1
+
+        player.x_vel = 0
+        if inputs & INPUT_LEFT:
+            player.x_vel = -PLAYER_VEL
+            player.direction = -1
+        if inputs & INPUT_RIGHT:
+            player.x_vel = PLAYER_VEL
+            player.direction = 1
+        
+        with profiler.scope("step.player"):
+            player.update(self.platform_grid)
+        self.camera.follow(player.rect)
+        if self.world:
+            with profiler.scope("step.stream"):
+                if self.world.stream(self.camera.view):
+                    self._refresh_world()
+                    # Les ennemis chargés ont changé : plus de correspondance avec les positions précédentes
+                    self.previous = (self.previous[0], None, self.previous[2])
+        
+        for s in self.showers: s.update()
+        with profiler.scope("step.enemies"):
+            for flow in self.flows.values(): flow.update(player.rect.center)
+            self.enemies.update(player.rect, self.flows)
+        self.exit_door.update()
+        
+        with profiler.scope("step.collisions"):
+            events = self._resolve_collisions(events)
+        if events & {'restart', 'hit', 'level'}:
+            self.previous = None
+        return events
+
+    def _resolve_collisions(self, events):
+        player = self.player
+        # Douches redonnent de la vie
+        for shower in self.showers[:]:
+            if player.rect.colliderect(shower.rect):
+                if player.lives < MAX_LIVES:
+                    player.lives += 1
+                self.showers.remove(shower)
+                if self.world:
+                    self.world.collect(shower)
+                events.add('shower')
+        
+        if self.enemies.collides(player.rect):
+            player.lives -= 1
+            events.add('hit')
+            if player.lives <= 0: 
+                self.game_over = True
+                events.add('game_over')
+            else: 
+                reset_player(player)
+                # Réinitialiser la position des ennemis quand le joueur meurt
+                self.enemies.reset_positions()
+        
+        if player.rect.colliderect(self.exit_door.rect):
+            if self.level < self.max_levels:
+                self.level += 1
+                # Changement de Biome
+                biome = self.biome_of(self.level)
+                if biome != self.biome:
+                    self.biome = biome
+                    events.add('biome')
+                self.load_level()
+                reset_player(player)
+                events.add('level')
+            else:
+                self.victory = True
+                events.add('victory')
+        return events
+
+class ReplayPlayer:
+    """Relecture headless d'un Replay : un Game sans fenêtre, avancé aussi vite que le CPU le permet.
+    seek() va à n'importe quel pas (en rejouant depuis le début pour revenir en arrière).
+    make_game(seed, enemy_count, level_length) : Game à utiliser (avec sprites pour un rendu)."""
+    def __init__(self, replay, make_game=None):
+        if replay.generator_version != LEVEL_GENERATOR_VERSION:
+            raise ValueError("replay enregistré avec une autre version du générateur de niveaux")
+        self.replay = replay
+        self.make_game = make_game or (lambda seed, enemy_count, level_length:
+                                       Game(seed=seed, enemy_count=enemy_count, prebuild=False, level_length=level_length))
+        self.game = None
+        self.rewind()
+
+    def rewind(self):
+        replay = self.replay
+        if self.game:
+            self.game.levels.shutdown()
+        self.game = self.make_game(replay.seed, replay.enemy_count, replay.level_length)
+        self.frame = 0
+
+    @property
+    def done(self):
+        return self.frame >= len(self.replay)
+
+    def next_inputs(self):
+        inputs = self.replay.inputs[self.frame]
+        self.frame += 1
+        return inputs
+
+    def step(self):
+        return self.game.step(self.next_inputs())
+
+    def seek(self, frame):
+        frame = min(frame, len(self.replay))
+        if frame < self.frame:
+            self.rewind()
+        while self.frame < frame:
+            self.step()
+        return self.game
+
+def record_replay(game):
+    """Replay vide pour la partie en cours (même graine et paramètres)"""
+    return Replay(game.seed, game.enemy_count, game.level_length, LEVEL_GENERATOR_VERSION)
+
+# --- PACKS DE CONTENU ---
+# Campagne figée dans un fichier (content_pack.py) : niveaux, biomes et dialogues lus depuis le pack
+# au lieu d'être générés. freeze_content_pack() y écrit les niveaux procéduraux d'une graine.
+
+def packed_level(screens):
+    """LevelData des écrans construits d'un niveau (un seul, ou les chunks d'un niveau long)"""
+    count = len(screens)
+    tiles = np.zeros((GRID_ROWS, GRID_COLS * count), dtype=np.uint8)
+    enemies, showers = [], []
+    for index, built in enumerate(screens):
+        for p in built.platforms:
+            rect = p.rect.clip(pygame.Rect(0, 0, tiles.shape[1] * TILE_SIZE, HEIGHT))
+            tiles[rect.top // TILE_SIZE:-(-rect.bottom // TILE_SIZE),
+                  rect.left // TILE_SIZE:-(-rect.right // TILE_SIZE)] = TILE_BLOCK
+        for col, row in (chunk_cells(index, count) if count > 1 else border_cells()):
+            if col < GRID_COLS and row < GRID_ROWS:
+                tiles[row, index * GRID_COLS + col] = TILE_WALL
+        enemies.extend(built.enemies.start.tolist())
+        showers.extend(s.rect.topleft for s in built.showers)
+    x, y, w, h = EXIT_AREA
+    return LevelData(tiles, enemies, showers, ((count - 1) * CHUNK_WIDTH + x, y, w, h))
+
+def freeze_content_pack(path, seed=0, enemy_count=10, level_length=1):
+    """Écrit dans path la campagne procédurale de la graine (première partie de Game(seed=seed)),
+    avec les biomes et dialogues de BIOMES et DIALOGUES"""
+    game = Game(seed=seed, enemy_count=enemy_count, prebuild=False, level_length=level_length)
+    levels = []
+    for level in range(1, game.max_levels + 1):
+        screens = [game.build_screen(level, game.run_seed + index, index, level_length) for index in range(level_length)]
+        levels.append(packed_level(screens))
+        for built in screens: built.release()
+    game.levels.shutdown()
+    return write_content_pack(path, BIOMES, DIALOGUES, levels)
+
+def load_content_pack(path):
+    """Pack de contenu dont les biomes ne désignent que des assets et dialogues existants"""
+    pack = ContentPack(path)
+    for biome in pack.biomes:
+        for name in (biome['background'], biome['enemy']):
+            if name not in ASSET_SPECS:
+                raise ValueError(f"pack de contenu : asset inconnu {name!r}")
+        if biome['dialogue'] and biome['dialogue'] not in pack.dialogues:
+            raise ValueError(f"pack de contenu : dialogue inconnu {biome['dialogue']!r}")
+    return pack
+
 # --- BOUCLE PRINCIPALE ---
 
-def main():
-    clock = pygame.time.Clock()
-    
-    print("Chargement des ressources...")
-    cave_bg = load_background()
-    ocean_bg = load_ocean_background()
-    menu_bg = load_menu_background()
-    
-    tiles = load_tileset()
-    player_sprite = load_player_sprite()
-    heart_sprite = load_heart_sprite()
-    shower_sprite = load_shower_sprite()
-    
-    # Chargement des sprites ennemis
-    cyclops_sprite = load_cyclops_sprite()
-    miro_sprite = load_miro_sprite()
-    
-    Odysseus_p = load_Odysseus_portrait()
-    cyclops_p = load_cyclops_portrait()
-    siren1_p = load_siren1_portrait()
-    siren2_p = load_siren2_portrait()
-    game_over_img = load_game_over_image() 
-    victory_img = load_victory_image()
-    print("Ressources chargées!")
-    
-    # --- ETATS DU JEU ---
-    GAME_STATE_MENU = 0
-    GAME_STATE_DIALOGUE = 1
-    GAME_STATE_PLAYING = 2
-    
-    current_state = GAME_STATE_MENU
-    
-    # Initialisation du Menu
-    main_menu = MainMenu(menu_bg)
+def read_held_inputs():
+    """Déplacements maintenus au clavier, en bits INPUT_*"""
+    keys = pygame.key.get_pressed()
+    inputs = 0
+    if keys[pygame.K_LEFT]: inputs |= INPUT_LEFT
+    if keys[pygame.K_RIGHT]: inputs |= INPUT_RIGHT
+    return inputs
 
-    # Initialisation Scène Dialogue
-    dialogue_scene = DialogueScene(cave_bg, "Cyclops", {'Odysseus': Odysseus_p, 'Cyclops': cyclops_p})
-    
-    # Initialisation Jeu
-    current_level = 1
-    levels_per_biome = 3 # 3 niveaux par biome
-    max_levels = 6       # 6 niveaux au total
-    current_biome = 1 
-    current_bg = cave_bg
-    
-    player = Player(100, HEIGHT - 200, player_sprite)
-    
-    # Sélectionne le sprite ennemi selon le biome initial (1 = Cyclope)
-    current_enemy_sprite = cyclops_sprite if current_biome == 1 else miro_sprite
-    platforms, showers, exit_door, enemy_list = generate_random_level(current_level, tiles, current_enemy_sprite, shower_sprite)
-    
-    hearts = []
-    if heart_sprite:
-        for i in range(MAX_LIVES): hearts.append(Heart(20 + i * 55, 20, heart_sprite))
+class App:
+    """Menu, dialogues, jeu et écrans de fin. update() fait avancer l'état d'une frame,
+    draw() la dessine et renvoie les zones modifiées : les deux phases peuvent être
+    pilotées par des évènements et touches synthétiques (voir bench.py).
+    record() enregistre les entrées de chaque pas de jeu ; play(replay) rejoue une partie à la place
+    du clavier (sans menu ni dialogues)."""
+    STATE_MENU = 0
+    STATE_DIALOGUE = 1
+    STATE_PLAYING = 2
 
-    font = pygame.font.Font(None, 48)
-    big_font = pygame.font.Font(None, 72)
-    
-    running = True
-    game_over = False
-    victory = False
-    waiting_for_siren_dialogue = False
-
-    while running:
-        clock.tick(FPS)
-        events = pygame.event.get()
+    def __init__(self, seed=None, enemy_count=10, level_length=1, pack=None):
+        print("Chargement des ressources...")
+        # Seuls le menu et le premier niveau sont décodés avant d'afficher le menu ;
+        # portraits, images de fin et assets du biome 2 le sont à la première utilisation.
+        self.assets = AssetRegistry()
+        self.menu_bg = self.assets.get('menu_bg')
+
+        self.tiles = {'block': self.assets.get('tile'), 'wall': self.assets.get('tile')}
+        self.heart_sprite = self.assets.get('heart')
+
+        self.game_over_img = self.assets.handle('game_over')
+        self.victory_img = self.assets.handle('victory')
+        print("Ressources chargées!")
+
+        self.state = self.STATE_MENU
+        self.main_menu = MainMenu(self.menu_bg)
+        # Scène Dialogue construite au lancement de la partie
+        self.dialogue_scene = None
+
+        # Initialisation Jeu (sprites lus dans le registre : l'ennemi d'un biome n'est décodé qu'en y entrant)
+        self.game = Game(self.assets, self.tiles, seed=seed, enemy_count=enemy_count, bake=self.bake_level,
+                         level_length=level_length, pack=pack)
+        # Portraits du premier dialogue décodés pendant que le menu s'affiche
+        self.assets.prefetch(self.biome_assets(self.game.biomes[0]))
+        self.renderer = GameplayRenderer(self.game.level_surface)
+
+        self.hearts = []
+        if self.heart_sprite:
+            for i in range(MAX_LIVES): self.hearts.append(Heart(20 + i * 55, 20, self.heart_sprite))
+
+        self.font = pygame.font.Font(None, 48)
+        self.big_font = pygame.font.Font(None, 72)
+
+        # Écrans de fin composés au premier affichage, puis réutilisés
+        self.end_screens = {}
+        self.end_screen_shown = False
+        # Menu et dialogue sont présentés par zones modifiées : état (ou scène de dialogue) affiché à l'écran
+        self.drawn_state = None
+        self.running = True
+        # Profileur (F3 : overlay, F4 : export Chrome trace)
+        self.profiler_overlay = ProfilerOverlay(profiler, pygame.font.Font(None, 22))
+        # Replay en cours d'enregistrement, ou entrées rejouées
+        self.recording = None
+        self.playback = None
+
+    def record(self):
+        self.recording = record_replay(self.game)
+        return self.recording
+
+    def play(self, replay, start_frame=0):
+        """Rejoue replay dans le jeu affiché, après avoir avancé sans rendu jusqu'à start_frame"""
+        self.game.levels.shutdown()
+        player = ReplayPlayer(replay, lambda seed, enemy_count, level_length:
+                              Game(self.assets, self.tiles, seed=seed, enemy_count=enemy_count, bake=self.bake_level,
+                                   level_length=level_length))
+        player.seek(start_frame)
+        self.game = player.game
+        self.playback = player
+        self.state = self.STATE_PLAYING
+        self.renderer.set_background(self.game.level_surface)
+
+    def bake_level(self, biome, platforms, offset=(0, 0)):
+        """Fond du niveau (ou d'un chunk) pré-rendu avec ses plateformes (appelé par le LevelPipeline du jeu)"""
+        return bake_level_surface(self.assets.get(biome['background']), platforms, offset)
+
+    def biome_assets(self, biome):
+        """Assets utilisés en entrant dans le biome : fond, ennemi et portraits de son dialogue"""
+        lines = self.game.dialogue(biome['dialogue']) if biome['dialogue'] else []
+        return [biome['background'], biome['enemy']] + dialogue_portraits(lines)
+
+    def biome_dialogue(self, biome):
+        """Scène du dialogue d'entrée du biome (None s'il n'en a pas)"""
+        lines = self.game.dialogue(biome['dialogue']) if biome['dialogue'] else []
+        if not lines:
+            return None
+        portraits = {speaker: self.assets.get(PORTRAITS[speaker]) for speaker, _ in lines if speaker in PORTRAITS}
+        return DialogueScene(self.assets.get(biome['background']), biome['dialogue'], portraits, lines)
+
+    @property
+    def scene(self):
+        """Nom de l'état affiché : menu, dialogue, playing, game_over ou victory"""
+        if self.state == self.STATE_MENU: return "menu"
+        if self.state == self.STATE_DIALOGUE: return "dialogue"
+        if self.game.victory: return "victory"
+        if self.game.game_over: return "game_over"
+        return "playing"
+
+    def update(self, events, held=None, mouse_pos=None):
+        """Une frame de logique. held : bits INPUT_LEFT/INPUT_RIGHT maintenus (clavier si None)"""
         for event in events:
-            if event.type == pygame.QUIT: running = False
+            if event.type == pygame.QUIT: self.running = False
+            if event.type == pygame.WINDOWEXPOSED:
+                self.end_screen_shown = False
+                self.drawn_state = None
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                profiler.toggle()
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                print(f"Trace écrite : {profiler.export_chrome_trace()}")
 
-        # --- GESTION DES ETATS ---
-        
         # 1. MENU
-        if current_state == GAME_STATE_MENU:
-            action = main_menu.update(events)
-            if action == "start":
-                current_state = GAME_STATE_DIALOGUE
-            main_menu.draw(window)
+        if self.state == self.STATE_MENU:
+            if self.main_menu.update(events, mouse_pos) == "start":
+                self.dialogue_scene = self.biome_dialogue(self.game.biomes[0])
+                self.state = self.STATE_DIALOGUE if self.dialogue_scene else self.STATE_PLAYING
 
         # 2. DIALOGUE
-        elif current_state == GAME_STATE_DIALOGUE:
-            dialogue_scene.update(events)
-            dialogue_scene.draw(window)
-            
-            if dialogue_scene.finished:
-                current_state = GAME_STATE_PLAYING
-                if waiting_for_siren_dialogue:
-                    waiting_for_siren_dialogue = False
-        
+        elif self.state == self.STATE_DIALOGUE:
+            self.dialogue_scene.update(events)
+            if self.dialogue_scene.finished or self.playback:
+                self.state = self.STATE_PLAYING
+
         # 3. JEU (PLAYING)
-        elif current_state == GAME_STATE_PLAYING:
-            for event in events:
-                if event.type == pygame.KEYDOWN:
-                    if not game_over and not victory:
-                        if event.key == pygame.K_SPACE: player.jump()
-                    
-                    if game_over or victory:
-                        if event.key == pygame.K_r:
-                            # Reset
-                            current_level = 1
-                            current_biome = 1
-                            current_bg = cave_bg
-                            player.lives = MAX_LIVES
-                            reset_player(player)
-                            
-                            current_enemy_sprite = cyclops_sprite if current_biome == 1 else miro_sprite
-                            platforms, showers, exit_door, enemy_list = generate_random_level(current_level, tiles, current_enemy_sprite, shower_sprite)
-                            game_over = False
-                            victory = False
-
-            if not game_over and not victory:
-                keys = pygame.key.get_pressed()
-                player.x_vel = 0
-                if keys[pygame.K_LEFT]: 
-                    player.x_vel = -PLAYER_VEL
-                    player.direction = -1
-                if keys[pygame.K_RIGHT]: 
-                    player.x_vel = PLAYER_VEL
-                    player.direction = 1
-                
-                player.update(platforms)
-                
-                for s in showers: s.update()
-                for c in enemy_list: c.update(player.rect)
-                exit_door.update()
-                
-                # Douches redonnent de la vie
-                for shower in showers[:]:
-                    if player.rect.colliderect(shower.rect):
-                        if player.lives < MAX_LIVES:
-                            player.lives += 1
-                        showers.remove(shower)
-                
-                hit_enemy = any(player.rect.colliderect(c.rect) for c in enemy_list)
-
-                if hit_enemy:
-                    player.lives -= 1
-                    if player.lives <= 0: 
-                        game_over = True
-                    else: 
-                        reset_player(player)
-                        # Réinitialiser la position des ennemis quand le joueur meurt
-                        for c in enemy_list:
-                            c.reset_position()
-                
-                if player.rect.colliderect(exit_door.rect):
-                    if current_level < max_levels:
-                        current_level += 1
-                        
-                        # Changement de Biome
-                        if current_level == levels_per_biome + 1 and current_biome == 1:
-                            current_biome = 2
-                            current_bg = ocean_bg
-                            dialogue_scene = DialogueScene(ocean_bg, "sirens", {'Odysseus': Odysseus_p, 'siren1': siren1_p, 'siren2': siren2_p})
-                            current_state = GAME_STATE_DIALOGUE
-                            waiting_for_siren_dialogue = True
-                        
-                        # Génération du niveau avec le bon sprite
-                        current_enemy_sprite = cyclops_sprite if current_biome == 1 else miro_sprite
-                        platforms, showers, exit_door, enemy_list = generate_random_level(current_level, tiles, current_enemy_sprite, shower_sprite)
-                        reset_player(player)
-                    else:
-                        victory = True
-            
-            # Dessin
-            window.blit(current_bg, (0, 0))
-            for p in platforms: p.draw(window)
-            for s in showers: s.draw(window)
-            exit_door.draw(window)
-            player.draw(window)
-            for c in enemy_list: c.draw(window)
-            
-            if heart_sprite:
-                for i in range(player.lives): hearts[i].draw(window)
+        elif self.state == self.STATE_PLAYING:
+            if self.playback:
+                if self.playback.done:
+                    self.running = False
+                    return
+                inputs = self.playback.next_inputs()
             else:
-                window.blit(font.render(f"Lives: {player.lives}", True, WHITE), (20, 20))
-
-            biome_name = "Java Cave" if current_biome == 1 else "Prosanta's Sea"
-            lvl_in_biome = current_level if current_biome == 1 else current_level - levels_per_biome
-            window.blit(font.render(f"{biome_name} - Level {lvl_in_biome}/{levels_per_biome}", True, WHITE), (WIDTH - 500, 20))
-            
-            if victory:
-                # Affiche l'image de victoire si elle est chargée
-                if victory_img:
-                    scaled_img = pygame.transform.scale(victory_img, (WIDTH, HEIGHT))
-                    window.blit(scaled_img, (0, 0))
-                else:
-                    pygame.draw.rect(window, BLACK, (0, 0, WIDTH, HEIGHT))
-                window.blit(big_font.render("VICTORY!", True, HADES_GOLD), (WIDTH // 2 - 150, HEIGHT // 2 - 50))
-                window.blit(font.render("Press R to restart", True, WHITE), (WIDTH // 2 - 250, HEIGHT // 2 + 20))
-            elif game_over:
-                if game_over_img:
-                    scaled_img = pygame.transform.scale(game_over_img, (WIDTH, HEIGHT))
-                    window.blit(scaled_img, (0, 0))
-                else:
-                    pygame.draw.rect(window, BLACK, (0, 0, WIDTH, HEIGHT))
-                
-                window.blit(big_font.render("GAME OVER", True, (255, 0, 0)), (WIDTH // 2 - 150, HEIGHT // 2 - 50))
-                window.blit(font.render("Press R to restart", True, WHITE), (WIDTH // 2 - 250, HEIGHT // 2 + 20))
-                pygame.mixer.Sound.play(aah_sound)
-        
-        pygame.display.flip()
-    
+                inputs = read_held_inputs() if held is None else held
+                for event in events:
+                    if event.type == pygame.KEYDOWN:
+                        if event.key == pygame.K_SPACE: inputs |= INPUT_JUMP
+                        if event.key == pygame.K_r: inputs |= INPUT_RESTART
+            self._step_game(inputs)
+
+    def _step_game(self, inputs):
+        game, assets = self.game, self.assets
+        if self.recording is not None:
+            self.recording.record(inputs)
+        step_events = game.step(inputs)
+
+        if 'biome' in step_events:
+            self.dialogue_scene = self.biome_dialogue(game.biomes[game.biome - 1])
+            if self.dialogue_scene:
+                self.state = self.STATE_DIALOGUE
+        if 'restart' in step_events or 'level' in step_events:
+            # Niveau et fond déjà construits en arrière-plan
+            self.renderer.set_background(game.level_surface)
+        if 'game_over' in step_events and aah_sound:
+            pygame.mixer.Sound.play(aah_sound)
+
+        # Préchargement en arrière-plan de la scène suivante
+        if game.level < game.max_levels and game.biome_of(game.level + 1) != game.biome:
+            assets.prefetch(self.biome_assets(game.biomes[game.biome_of(game.level + 1) - 1]))
+        if game.level == game.max_levels:
+            assets.prefetch(['victory'])
+        if game.player.lives <= 2:
+            assets.prefetch(['game_over'])
+
+    def draw(self, surface, alpha=1.0):
+        """Dessine l'état courant, renvoie les zones à présenter (vide si rien n'a changé).
+        alpha : avancement dans le pas de simulation en cours (voir FixedTimestep)"""
+        dirty_rects = self._draw_state(surface, alpha)
+        if profiler.enabled and (self.state != self.STATE_PLAYING or self.game.finished):
+            # Hors jeu, l'overlay est posé par-dessus et la frame suivante repart d'un rendu complet
+            with profiler.scope("draw.overlay"):
+                surface.blit(self.profiler_overlay.render(), self.profiler_overlay.rect)
+            dirty_rects = dirty_rects + [self.profiler_overlay.rect]
+            self.drawn_state = None
+            self.end_screen_shown = False
+        return dirty_rects
+
+    def _draw_state(self, surface, alpha=1.0):
+        if self.state == self.STATE_MENU:
+            dirty_rects = self.main_menu.draw_dirty(surface, full=self.drawn_state != self.STATE_MENU)
+            self.drawn_state = self.STATE_MENU
+            return dirty_rects
+
+        if self.state == self.STATE_DIALOGUE:
+            dirty_rects = self.dialogue_scene.draw_dirty(surface, full=self.drawn_state is not self.dialogue_scene)
+            self.drawn_state = self.dialogue_scene
+            return dirty_rects
+
+        game, player = self.game, self.game.player
+        if self.drawn_state != self.STATE_PLAYING:
+            self.renderer.invalidate()
+        self.drawn_state = self.STATE_PLAYING
+        if game.finished and self.end_screen_shown:
+            # Écran de fin déjà présenté et la partie est figée : rien à redessiner
+            return []
+
+        # Dessin par zones modifiées sur le fond + plateformes pré-rendus
+        font = self.font
+        hud = []
+        if profiler.enabled:
+            # En jeu, l'overlay est un élément du HUD redessiné à chaque frame
+            with profiler.scope("draw.overlay"):
+                hud.append(('profiler', self.profiler_overlay.render(), self.profiler_overlay.rect.topleft, profiler.frame_id))
+        if self.heart_sprite:
+            hud.extend((('heart', i), self.hearts[i].image, self.hearts[i].rect.topleft, None) for i in range(player.lives))
+        else:
+            lives_text = f"Lives: {player.lives}"
+            hud.append(('lives', text_cache.render(font, lives_text, WHITE), (20, 20), lives_text))
+
+        biome = game.biomes[game.biome - 1]
+        lvl_in_biome = game.level - game.biome_first[game.biome - 1] + 1
+        level_text = f"{biome['name']} - Level {lvl_in_biome}/{biome['levels']}"
+        with profiler.scope("draw.text"):
+            hud.append(('level', text_cache.render(font, level_text, WHITE), (WIDTH - 500, 20), level_text))
+        with profiler.scope("draw.sprites"):
+            dirty_rects = self.renderer.draw(surface, game, hud, alpha)
+
+        if game.victory:
+            # Affiche l'image de victoire si elle est chargée
+            if 'victory' not in self.end_screens:
+                self.end_screens['victory'] = compose_end_screen(self.victory_img.get(), "VICTORY!", HADES_GOLD, font, self.big_font)
+            surface.blit(self.end_screens['victory'], (0, 0))
+        elif game.game_over:
+            if 'game_over' not in self.end_screens:
+                self.end_screens['game_over'] = compose_end_screen(self.game_over_img.get(), "GAME OVER", (255, 0, 0), font, self.big_font)
+            surface.blit(self.end_screens['game_over'], (0, 0))
+        if game.finished:
+            # L'écran de fin recouvre tout : le prochain rendu de jeu repartira de zéro
+            self.renderer.invalidate()
+            dirty_rects = [surface.get_rect()]
+        self.end_screen_shown = game.finished
+        return dirty_rects
+
+class FixedTimestep:
+    """Pas de simulation fixe (dt), indépendant de la cadence du rendu.
+    advance() renvoie le nombre de pas à simuler pour rattraper le temps réel (au plus MAX_TICKS :
+    au-delà, le retard est abandonné plutôt que de s'emballer) ; alpha est la fraction de pas restante,
+    utilisée pour interpoler le rendu. Si la simulation prend du retard plusieurs frames de suite, une frame
+    sur render_interval seulement est dessinée, jusqu'à ce que la charge redescende."""
+    MAX_TICKS = 5
+    MAX_RENDER_INTERVAL = 4
+    LATE_FRAMES = 3       # frames en retard avant de dessiner moins souvent
+    RECOVER_FRAMES = 120  # frames à l'heure avant de dessiner plus souvent
+
+    def __init__(self, dt=1 / FPS, clock=time.perf_counter):
+        self.dt = dt
+        self.clock = clock
+        self.last = None
+        self.accumulator = 0.0
+        self.render_interval = 1
+        self.frame = 0
+        self.late = 0
+        self.on_time = 0
+
+    def advance(self):
+        now = self.clock()
+        if self.last is not None:
+            self.accumulator += now - self.last
+        self.last = now
+        ticks = min(int(self.accumulator / self.dt), self.MAX_TICKS)
+        self.accumulator -= ticks * self.dt
+        if self.accumulator >= self.dt:
+            self.accumulator %= self.dt
+        self._track_load(ticks)
+        return ticks
+
+    def _track_load(self, ticks):
+        if ticks > 1:
+            self.late, self.on_time = self.late + 1, 0
+            if self.late >= self.LATE_FRAMES and self.render_interval < self.MAX_RENDER_INTERVAL:
+                self.render_interval += 1
+                self.late = 0
+        else:
+            self.late, self.on_time = 0, self.on_time + 1
+            if self.on_time >= self.RECOVER_FRAMES and self.render_interval > 1:
+                self.render_interval -= 1
+                self.on_time = 0
+
+    @property
+    def alpha(self):
+        return self.accumulator / self.dt
+
+    def should_render(self):
+        self.frame += 1
+        return self.frame % self.render_interval == 0
+
+def present(dirty_rects):
+    """Seules les zones modifiées sont présentées, rien si l'écran n'a pas changé"""
+    if dirty_rects:
+        pygame.display.update(dirty_rects)
+
+def main(level_length=1, record=None, replay=None, start_frame=0, render_fps=FPS, vsync=False, capture=None,
+         capture_scale=1, pack=None, seed=None):
+    """record : fichier où enregistrer la partie ; replay : Replay à rejouer (à partir de start_frame).
+    pack : ContentPack à jouer à la place de la campagne procédurale, fermé en quittant ; seed : graine de la
+    partie (aléatoire par défaut).
+    La simulation avance par pas fixes de 1/FPS s ; render_fps limite le rendu (0 : sans limite).
+    capture : fichier vidéo (ou .rgb) où écrire une frame par pas de simulation, réduite de capture_scale."""
+    init_display(vsync)
+    frame_capture = FrameCapture(window, capture_scale) if capture else None
+    sink = open_sink(capture, frame_capture.size, FPS) if capture else None
+    clock = pygame.time.Clock()
+    timestep = FixedTimestep()
+    app = App(seed=seed, level_length=level_length, pack=pack)
+    if replay:
+        app.play(replay, start_frame)
+    elif record:
+        app.record()
+
+    # Capture : exactement un pas de simulation par frame écrite, dessinée en fin de pas (alpha = 1) et sans
+    # rattrapage du temps réel, donc une vidéo à FPS images/s identique d'une capture du même replay à l'autre.
+    # Une partie jouée reste cadencée à FPS ; un replay avance aussi vite que l'écriture le permet.
+    while sink and app.running:
+        if not replay:
+            clock.tick(FPS)
+        profiler.begin_frame()
+        app.update(pygame.event.get())
+        if app.running:
+            present(app.draw(window))
+            with profiler.scope("capture"):
+                frame_capture.push(sink, block=True)
+        profiler.end_frame()
+
+    # Évènements reçus entre deux pas de simulation, transmis au pas suivant
+    pending = []
+    while app.running:
+        clock.tick(render_fps)
+        profiler.begin_frame()
+        with profiler.scope("events"):
+            pending += pygame.event.get()
+        with profiler.scope("update"):
+            for _ in range(timestep.advance()):
+                app.update(pending)
+                pending = []
+        if timestep.should_render():
+            with profiler.scope("draw"):
+                dirty_rects = app.draw(window, timestep.alpha)
+            with profiler.scope("present"):
+                present(dirty_rects)
+        profiler.end_frame()
+
+    app.game.levels.shutdown()
+    if pack:
+        pack.close()
+    app.assets.save()
+    if app.recording is not None:
+        print(f"Replay écrit : {app.recording.save(record)} ({len(app.recording)} pas)")
+    if sink:
+        print(f"Capture écrite : {capture} ({sink.close()} frames, {sink.dropped} abandonnées)")
     pygame.quit()
     sys.exit()
 
+def fast_forward(replay, frame=None):
+    """Relecture headless jusqu'au pas `frame` (fin du replay par défaut), affiche l'état atteint"""
+    player = ReplayPlayer(replay)
+    game = player.seek(len(replay) if frame is None else frame)
+    state = "victory" if game.victory else "game_over" if game.game_over else "playing"
+    print(f"pas {player.frame}/{len(replay)} : niveau {game.level}, vies {game.player.lives}, {state}, "
+          f"joueur {game.player.rect.topleft}")
+    game.levels.shutdown()
+    return game
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Java Odyssey")
+    parser.add_argument("--build-assets", action="store_true", help="construit le bundle d'assets et les graines de niveaux")
+    parser.add_argument("--level-length", type=int, default=1, help="écrans par niveau (niveaux longs)")
+    parser.add_argument("--record", help="enregistre la partie dans ce fichier")
+    parser.add_argument("--replay", help="rejoue une partie enregistrée")
+    parser.add_argument("--frame", type=int, help="avec --replay : pas de départ (ou d'arrivée avec --headless)")
+    parser.add_argument("--fps", type=int, default=FPS, help="limite d'images par seconde du rendu (0 : sans limite)")
+    parser.add_argument("--vsync", action="store_true", help="rendu synchronisé sur l'écran")
+    parser.add_argument("--capture", help="écrit les frames rendues dans ce fichier (.mp4 via ffmpeg, .rgb brut)")
+    parser.add_argument("--capture-scale", type=int, default=1, help="réduction de la capture (2 : moitié)")
+    parser.add_argument("--headless", action="store_true", help="avec --replay : relecture sans fenêtre, au plus vite")
+    parser.add_argument("--pack", help="joue la campagne d'un pack de contenu")
+    parser.add_argument("--freeze-pack", help="écrit les niveaux procéduraux de --seed dans ce pack de contenu")
+    parser.add_argument("--seed", type=int, help="graine de la partie (aléatoire par défaut) ; avec --freeze-pack : "
+                                                 "graine de la campagne figée (0 par défaut)")
+    args = parser.parse_args()
+    if args.pack and (args.record or args.replay):
+        # Un replay ne contient que la graine : les niveaux d'un pack ne seraient pas rejoués
+        parser.error("--pack ne peut pas être combiné avec --record ou --replay")
+    if args.seed is not None and args.replay:
+        parser.error("--seed ne peut pas être combiné avec --replay (la graine est celle du replay)")
+    if args.build_assets:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+        init_display()
+        build_asset_bundle()
+        print(f"Bundle d'assets écrit : {ASSET_BUNDLE_PATH}")
+        for level in range(1, Game.MAX_LEVELS + 1):
+            level_seed_corpus.seeds(level)
+        print(f"Graines de niveaux validées : {LEVEL_SEEDS_PATH}")
+    elif args.freeze_pack:
+        print(f"Pack de contenu écrit : {freeze_content_pack(args.freeze_pack, args.seed or 0, level_length=args.level_length)}")
+    elif args.replay and args.headless:
+        fast_forward(Replay.load(args.replay), args.frame)
+    elif args.replay:
+        main(replay=Replay.load(args.replay), start_frame=args.frame or 0, render_fps=args.fps, vsync=args.vsync,
+             capture=args.capture, capture_scale=args.capture_scale)
+    else:
+        main(args.level_length, args.record, render_fps=args.fps, vsync=args.vsync, capture=args.capture,
+             capture_scale=args.capture_scale, pack=load_content_pack(args.pack) if args.pack else None, seed=args.seed)
@@ -0,0 +1,170 @@
+"""Profileur de frames : scopes nommés autour des phases de la boucle, mémorisés dans un buffer
+circulaire de taille fixe, affichables en overlay (F3) et exportables au format Chrome trace (F4).
+
+    with profiler.scope("step.player"):
+        player.update(grid)
+
+Désactivé, scope() renvoie un contexte vide partagé : un test et un appel, aucune allocation.
+"""
+import json
+import time
+
+import pygame
+
+FRAME_CAPACITY = 600      # 10 s à 60 FPS
+EVENT_CAPACITY = 16384
+TRACE_PATH = "frame_trace.json"
+
+class _NullScope:
+    __slots__ = ()
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+
+_NULL_SCOPE = _NullScope()
+
+class _Scope:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.depth += 1
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        p = self.profiler
+        p.depth -= 1
+        p.events[p.event_head] = (p.frame_id, self.name, self.start, end, p.depth)
+        p.event_head = (p.event_head + 1) % len(p.events)
+        return False
+
+class Profiler:
+    """Buffers circulaires : frames (id, début, fin) et scopes (frame, nom, début, fin, profondeur), en ns"""
+
+    def __init__(self, frame_capacity=FRAME_CAPACITY, event_capacity=EVENT_CAPACITY):
+        self.enabled = False
+        self.frames = [None] * frame_capacity
+        self.events = [None] * event_capacity
+        self.clear()
+
+    def clear(self):
+        self.frames[:] = [None] * len(self.frames)
+        self.events[:] = [None] * len(self.events)
+        self.frame_head = 0
+        self.event_head = 0
+        self.frame_id = 0
+        self.frame_start = None
+        self.depth = 0
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        if not self.enabled:
+            self.frame_start = None
+        return self.enabled
+
+    def scope(self, name):
+        if not self.enabled:
+            return _NULL_SCOPE
+        return _Scope(self, name)
+
+    def begin_frame(self):
+        if self.enabled:
+            self.frame_start = time.perf_counter_ns()
+
+    def end_frame(self):
+        if self.enabled and self.frame_start is not None:
+            self.frames[self.frame_head] = (self.frame_id, self.frame_start, time.perf_counter_ns())
+            self.frame_head = (self.frame_head + 1) % len(self.frames)
+            self.frame_start = None
+        self.frame_id += 1
+
+    def recent_frames(self, count=None):
+        """Dernières frames mesurées, de la plus ancienne à la plus récente"""
+        n = len(self.frames)
+        frames = [f for f in (self.frames[(self.frame_head + i) % n] for i in range(n)) if f]
+        return frames[-count:] if count else frames
+
+    def recent_events(self):
+        n = len(self.events)
+        return [e for e in (self.events[(self.event_head + i) % n] for i in range(n)) if e]
+
+    def frame_times_ms(self, count=None):
+        return [(end - start) / 1e6 for _, start, end in self.recent_frames(count)]
+
+    def breakdown(self, frames=60):
+        """Temps moyen par frame (ms) de chaque scope sur les `frames` dernières frames, du plus coûteux au moins coûteux"""
+        recent = self.recent_frames(frames)
+        if not recent:
+            return []
+        first = recent[0][0]
+        totals = {}
+        for frame_id, name, start, end, _ in self.recent_events():
+            if frame_id >= first:
+                totals[name] = totals.get(name, 0) + end - start
+        return sorted(((name, total / 1e6 / len(recent)) for name, total in totals.items()),
+                      key=lambda item: -item[1])
+
+    def export_chrome_trace(self, path=TRACE_PATH):
+        """Écrit le contenu du buffer au format Chrome trace (chrome://tracing, Perfetto)"""
+        frames, events = self.recent_frames(), self.recent_events()
+        starts = [f[1] for f in frames] + [e[2] for e in events]
+        origin = min(starts) if starts else 0
+        trace = [{"name": "frame", "cat": "frame", "ph": "X", "pid": 0, "tid": 0,
+                  "ts": (start - origin) / 1000, "dur": (end - start) / 1000, "args": {"frame": frame_id}}
+                 for frame_id, start, end in frames]
+        trace += [{"name": name, "cat": name.split(".")[0], "ph": "X", "pid": 0, "tid": 0,
+                   "ts": (start - origin) / 1000, "dur": (end - start) / 1000, "args": {"frame": frame_id}}
+                  for frame_id, name, start, end, _ in events]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+        return path
+
+profiler = Profiler()
+
+# --- OVERLAY ---
+
+class ProfilerOverlay:
+    """Graphe des temps de frame et détail par scope, dans un panneau semi-transparent.
+    Le détail n'est recalculé que toutes les REFRESH frames pour rester lisible (et bon marché)."""
+    GRAPH_FRAMES = 120
+    GRAPH_HEIGHT = 60
+    BUDGET_MS = 1000 / 60
+    REFRESH = 15
+    MAX_LINES = 10
+
+    def __init__(self, profiler, font, pos=(10, 80)):
+        self.profiler = profiler
+        self.font = font
+        self.rect = pygame.Rect(pos, (self.GRAPH_FRAMES * 2 + 20, self.GRAPH_HEIGHT + 30 + self.MAX_LINES * 18))
+        self.surface = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        self.lines = []
+        self.age = self.REFRESH
+
+    def render(self):
+        """Panneau de la frame courante (à blitter en self.rect)"""
+        self.age += 1
+        if self.age >= self.REFRESH:
+            self.age = 0
+            times = self.profiler.frame_times_ms(60)
+            avg = sum(times) / len(times) if times else 0
+            self.lines = [self.font.render(f"frame {avg:6.2f} ms  max {max(times, default=0):6.2f}", True, (255, 255, 255))]
+            self.lines += [self.font.render(f"{name:<18}{ms:7.3f}", True, (220, 220, 220))
+                           for name, ms in self.profiler.breakdown(60)[:self.MAX_LINES - 1]]
+
+        surface = self.surface
+        surface.fill((0, 0, 0, 170))
+        base = 10 + self.GRAPH_HEIGHT
+        scale = self.GRAPH_HEIGHT / (self.BUDGET_MS * 2)
+        for i, ms in enumerate(self.profiler.frame_times_ms(self.GRAPH_FRAMES)):
+            h = min(self.GRAPH_HEIGHT, max(1, int(ms * scale)))
+            color = (90, 220, 90) if ms <= self.BUDGET_MS else (230, 70, 60)
+            surface.fill(color, (10 + i * 2, base - h, 2, h))
+        budget_y = base - int(self.BUDGET_MS * scale)
+        pygame.draw.line(surface, (255, 255, 0), (10, budget_y), (self.rect.width - 10, budget_y))
+        for i, line in enumerate(self.lines):
+            surface.blit(line, (10, base + 10 + i * 18))
+        return surface
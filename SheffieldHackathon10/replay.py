@@ -0,0 +1,100 @@
+"""Enregistrement compact des parties : graine + bits INPUT_* de chaque pas de simulation.
+Game.step étant déterministe pour une graine donnée, rejouer les entrées reproduit la partie exacte.
+
+Format : en-tête fixe (magie, version, graine, paramètres de la partie, nombre de pas), puis les
+entrées en plages (octet d'entrées, longueur en varint) compressées par zlib. Une minute de jeu
+tient en quelques centaines d'octets.
+"""
+import struct
+import zlib
+
+REPLAY_MAGIC = b"JORP"
+REPLAY_VERSION = 2  # 2 : ennemis guidés par FlowField (les parties v1 ne se rejouent plus à l'identique)
+# magie, version, graine, ennemis par niveau, écrans par niveau, version du générateur de niveaux, pas
+_HEADER = struct.Struct("<4sHQHHHI")
+_U16 = 0xFFFF
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+def encode_runs(inputs):
+    """Plages (octet, longueur) des entrées successives"""
+    out = bytearray()
+    i, n = 0, len(inputs)
+    while i < n:
+        j = i + 1
+        while j < n and inputs[j] == inputs[i]: j += 1
+        out.append(inputs[i])
+        _write_varint(out, j - i)
+        i = j
+    return bytes(out)
+
+def decode_runs(data):
+    inputs = bytearray()
+    pos = 0
+    while pos < len(data):
+        value = data[pos]
+        run, pos = _read_varint(data, pos + 1)
+        inputs += bytes((value,)) * run
+    return inputs
+
+class Replay:
+    """Graine et paramètres de la partie, et entrées de chaque appel à Game.step"""
+    def __init__(self, seed, enemy_count=10, level_length=1, generator_version=1, inputs=b""):
+        # Vérifié ici plutôt qu'à l'écriture : une partie enregistrée ne doit pas échouer à la sauvegarde
+        if not 0 <= seed < 1 << 64:
+            raise ValueError(f"graine hors de l'intervalle [0, 2**64) : {seed}")
+        for name, value in (("enemy_count", enemy_count), ("level_length", level_length),
+                            ("generator_version", generator_version)):
+            if not 0 <= value <= _U16:
+                raise ValueError(f"{name} hors de l'intervalle [0, {_U16}] : {value}")
+        self.seed = seed
+        self.enemy_count = enemy_count
+        self.level_length = level_length
+        self.generator_version = generator_version
+        self.inputs = bytearray(inputs)
+
+    def __len__(self): return len(self.inputs)
+
+    def record(self, inputs):
+        self.inputs.append(inputs)
+
+    def encode(self):
+        header = _HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, self.seed, self.enemy_count, self.level_length,
+                              self.generator_version, len(self.inputs))
+        return header + zlib.compress(encode_runs(self.inputs), 9)
+
+    @classmethod
+    def decode(cls, data):
+        if len(data) < _HEADER.size:
+            raise ValueError("replay tronqué")
+        magic, version, seed, enemy_count, level_length, generator_version, frames = _HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError("format de replay inconnu")
+        inputs = decode_runs(zlib.decompress(data[_HEADER.size:]))
+        if len(inputs) != frames:
+            raise ValueError("replay corrompu")
+        return cls(seed, enemy_count, level_length, generator_version, inputs)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.encode())
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.decode(f.read())
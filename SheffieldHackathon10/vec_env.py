@@ -0,0 +1,158 @@
+"""Environnement vectorisé : N parties headless indépendantes réparties sur un pool de processus,
+pour les bots d'équilibrage et l'entraînement d'agents.
+
+    with VecEnv(64, seed=0) as env:
+        obs = env.reset()
+        while True:
+            obs, rewards, dones = env.step(actions)   # actions : bits INPUT_* par partie
+
+Actions, observations, récompenses et fins de partie passent par un bloc de mémoire partagée
+(tableaux NumPy vus des deux côtés) : à chaque pas, seul un octet de commande transite par pipe vers
+chaque processus, rien n'est sérialisé. Une partie terminée (game over ou victoire) est relancée
+automatiquement ; l'observation renvoyée est alors celle de la nouvelle partie.
+"""
+import os
+import multiprocessing as mp
+from multiprocessing.shared_memory import SharedMemory
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+
+import plateformer as pf
+
+OBS_ENEMIES = 4   # ennemis les plus proches dans l'observation
+OBS_SIZE = 10 + 2 * OBS_ENEMIES
+ACTION_MASK = pf.INPUT_LEFT | pf.INPUT_RIGHT | pf.INPUT_JUMP
+REWARDS = {'level': 1.0, 'victory': 1.0, 'shower': 0.1, 'hit': -0.5, 'game_over': -1.0}
+
+def observe(game, out):
+    """Observation de la partie dans out (float32[OBS_SIZE]) : joueur, sortie et ennemis proches,
+    positions relatives au joueur normalisées par la taille de l'écran"""
+    player, rect = game.player, game.player.rect
+    out[0] = rect.centerx / game.platform_grid.bounds.width
+    out[1] = rect.centery / pf.HEIGHT
+    out[2] = player.x_vel / pf.PLAYER_VEL
+    out[3] = player.y_vel / player.MAX_FALL_SPEED
+    out[4] = player.on_ground
+    out[5] = player.wall_direction
+    out[6] = player.lives / pf.MAX_LIVES
+    out[7] = game.level / game.max_levels
+    out[8] = (game.exit_door.rect.centerx - rect.centerx) / pf.WIDTH
+    out[9] = (game.exit_door.rect.centery - rect.centery) / pf.HEIGHT
+    enemies = out[10:].reshape(OBS_ENEMIES, 2)
+    enemies[:] = 0
+    pos = game.enemies.pos
+    if len(pos):
+        width, height = game.biomes[game.biome - 1]['enemy_size']
+        delta = (pos + (width // 2, height // 2) - rect.center) / (pf.WIDTH, pf.HEIGHT)
+        nearest = np.argsort(np.einsum('ij,ij->i', delta, delta))[:OBS_ENEMIES]
+        enemies[:len(nearest)] = delta[nearest]
+
+def _layout(num_envs):
+    """Décalages des tableaux dans le bloc partagé (alignés sur 8 octets) et taille totale"""
+    fields = [("actions", np.uint8, (num_envs,)), ("rewards", np.float32, (num_envs,)),
+              ("dones", np.bool_, (num_envs,)), ("observations", np.float32, (num_envs, OBS_SIZE))]
+    layout, offset = [], 0
+    for name, dtype, shape in fields:
+        layout.append((name, dtype, shape, offset))
+        offset += -(-int(np.prod(shape)) * np.dtype(dtype).itemsize // 8) * 8
+    return layout, offset
+
+def _views(buf, num_envs):
+    layout, _ = _layout(num_envs)
+    return {name: np.ndarray(shape, dtype, buffer=buf, offset=offset) for name, dtype, shape, offset in layout}
+
+def _worker(conn, shm_name, num_envs, first, last, seed, enemy_count, level_length, frame_skip):
+    """Processus : parties first..last-1, pilotées par les commandes b"step", b"reset", b"close" """
+    shm = SharedMemory(name=shm_name)
+    views = _views(shm.buf, num_envs)
+    actions, rewards, dones, obs = (views[name][first:last] for name in ("actions", "rewards", "dones", "observations"))
+    games = [pf.Game(seed=seed + i, enemy_count=enemy_count, prebuild=False, level_length=level_length)
+             for i in range(first, last)]
+    try:
+        while True:
+            command = conn.recv_bytes()
+            if command == b"close":
+                break
+            for i, game in enumerate(games):
+                if command == b"reset":
+                    game.restart()
+                    rewards[i], dones[i] = 0, False
+                else:
+                    inputs, reward = int(actions[i]) & ACTION_MASK, 0.0
+                    for _ in range(frame_skip):
+                        for event in game.step(inputs):
+                            reward += REWARDS.get(event, 0.0)
+                        if game.finished:
+                            break
+                    rewards[i], dones[i] = reward, game.finished
+                    if game.finished:
+                        game.restart()
+                observe(game, obs[i])
+            conn.send_bytes(b"ok")
+    finally:
+        for game in games: game.levels.shutdown()
+        del views, actions, rewards, dones, obs
+        shm.close()
+
+class VecEnv:
+    """num_envs parties (graines seed, seed+1, ...) réparties sur num_workers processus (un par cœur par défaut).
+    frame_skip : pas de simulation par step() avec la même action (récompenses additionnées)."""
+    def __init__(self, num_envs, num_workers=None, seed=0, enemy_count=10, level_length=1, frame_skip=1):
+        self.num_envs = num_envs
+        num_workers = max(1, min(num_workers or os.cpu_count() or 1, num_envs))
+        # Graines validées écrites une fois ici plutôt que recalculées par chaque processus
+        for level in range(1, pf.Game.MAX_LEVELS + 1):
+            pf.level_seed_corpus.seeds(level)
+
+        _, size = _layout(num_envs)
+        self.shm = SharedMemory(create=True, size=size)
+        views = _views(self.shm.buf, num_envs)
+        self.actions, self.rewards = views["actions"], views["rewards"]
+        self.dones, self.observations = views["dones"], views["observations"]
+
+        ctx = mp.get_context()
+        self.conns, self.processes = [], []
+        bounds = np.linspace(0, num_envs, num_workers + 1).astype(int)
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            parent, child = ctx.Pipe()
+            process = ctx.Process(target=_worker, daemon=True,
+                                  args=(child, self.shm.name, num_envs, int(first), int(last), seed, enemy_count,
+                                        level_length, frame_skip))
+            process.start()
+            child.close()
+            self.conns.append(parent)
+            self.processes.append(process)
+
+    def _broadcast(self, command):
+        for conn in self.conns: conn.send_bytes(command)
+        for conn in self.conns: conn.recv_bytes()
+
+    def reset(self):
+        self._broadcast(b"reset")
+        return self.observations
+
+    def step(self, actions):
+        """actions : bits INPUT_LEFT/RIGHT/JUMP par partie. Renvoie (observations, récompenses, fins),
+        des vues sur la mémoire partagée réécrites au step suivant (copier pour les garder)"""
+        self.actions[:] = actions
+        self._broadcast(b"step")
+        return self.observations, self.rewards, self.dones
+
+    def close(self):
+        if self.shm is None:
+            return
+        for conn in self.conns:
+            try:
+                conn.send_bytes(b"close")
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes: process.join()
+        del self.actions, self.rewards, self.dones, self.observations
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()